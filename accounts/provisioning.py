@@ -0,0 +1,208 @@
+import csv
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ProvisioningJob
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+MIN_PASSWORD_LENGTH = 6
+# Below this many passwords a pool costs more to start than it saves.
+POOL_THRESHOLD = 32
+MAX_REPORTED_ERRORS = 500
+# Each password takes about half a second to hash. API uploads with up to this many
+# are provisioned inside the request, well within gunicorn's 30 s worker timeout;
+# larger ones run as a background job, which also gets the hashing pool.
+INLINE_MAX_PASSWORDS = 20
+UPLOAD_MAX_BYTES = 1024 * 1024
+
+USERNAME_LENGTH = User._meta.get_field('username').max_length
+
+
+def read_users(lines):
+    """Yield ``(line_number, row)`` from a CSV with ``username,email,password[,first_name,last_name]``."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, {
+            key: (row.get(key) or '').strip()
+            for key in ('username', 'email', 'first_name', 'last_name')
+        } | {'password': row.get('password') or ''}
+
+
+def row_errors(row):
+    errors = []
+    username = row['username']
+    if not username:
+        errors.append('Username is required.')
+    else:
+        try:
+            User.username_validator(username)
+        except ValidationError as e:
+            errors.extend(e.messages)
+        if len(username) > USERNAME_LENGTH:
+            errors.append(f'Username is longer than {USERNAME_LENGTH} characters.')
+    if row['email']:
+        try:
+            validate_email(row['email'])
+        except ValidationError as e:
+            errors.extend(e.messages)
+    if row['password'] and len(row['password']) < MIN_PASSWORD_LENGTH:
+        errors.append(f'Password must be at least {MIN_PASSWORD_LENGTH} characters.')
+    return errors
+
+
+class Provisioner:
+    def __init__(self, workers=None, chunk_size=CHUNK_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.executor = None
+        self.seen_usernames = set()
+        self.seen_emails = set()
+        self.report = {'rows': 0, 'created': 0, 'failed': 0, 'errors': [], 'hash_seconds': 0.0}
+
+    def fail(self, line_number, username, errors):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'line': line_number, 'username': username, 'errors': errors})
+
+    def hash_passwords(self, passwords):
+        # Blank passwords become unusable ones; those students go through password reset.
+        started = time.monotonic()
+        if self.workers > 1 and len(passwords) >= POOL_THRESHOLD:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(self.workers)
+            chunksize = max(1, len(passwords) // (self.workers * 4))
+            hashes = list(self.executor.map(make_password, passwords, chunksize=chunksize))
+        else:
+            hashes = [make_password(password) for password in passwords]
+        self.report['hash_seconds'] += time.monotonic() - started
+        return hashes
+
+    def process_chunk(self, chunk):
+        valid = []
+        for line_number, row in chunk:
+            errors = row_errors(row)
+            if row['username'] in self.seen_usernames:
+                errors.append('Username appears earlier in the file.')
+            if row['email'] and row['email'] in self.seen_emails:
+                errors.append('Email appears earlier in the file.')
+            self.seen_usernames.add(row['username'])
+            if row['email']:
+                self.seen_emails.add(row['email'])
+            if errors:
+                self.fail(line_number, row['username'], errors)
+            else:
+                valid.append((line_number, row))
+        if not valid:
+            return
+
+        taken_usernames = set()
+        taken_emails = set()
+        existing = User.objects.filter(
+            Q(username__in=[row['username'] for _, row in valid])
+            | Q(email__in=[row['email'] for _, row in valid if row['email']])
+        ).values_list('username', 'email')
+        for username, email in existing:
+            taken_usernames.add(username)
+            taken_emails.add(email)
+
+        rows = []
+        for line_number, row in valid:
+            errors = []
+            if row['username'] in taken_usernames:
+                errors.append('Username already exists.')
+            if row['email'] and row['email'] in taken_emails:
+                errors.append('Email already exists.')
+            if errors:
+                self.fail(line_number, row['username'], errors)
+            else:
+                rows.append((line_number, row))
+        if not rows:
+            return
+
+        hashes = self.hash_passwords([row['password'] or None for _, row in rows])
+        users = [
+            User(
+                username=row['username'], email=row['email'], password=password,
+                first_name=row['first_name'], last_name=row['last_name'],
+            )
+            for (_, row), password in zip(rows, hashes)
+        ]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            self.report['created'] += len(users)
+        except IntegrityError:
+            # Someone signed up with one of these usernames since the check; find which.
+            for (line_number, row), user in zip(rows, users):
+                try:
+                    with transaction.atomic():
+                        user.save()
+                    self.report['created'] += 1
+                except IntegrityError:
+                    self.fail(line_number, row['username'], ['Username already exists.'])
+
+    def run(self, rows):
+        started = time.monotonic()
+        chunk = []
+        try:
+            for line_number, row in rows:
+                self.report['rows'] += 1
+                chunk.append((line_number, row))
+                if len(chunk) >= self.chunk_size:
+                    self.process_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self.process_chunk(chunk)
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+        elapsed = time.monotonic() - started
+        self.report['errors'].sort(key=lambda error: error['line'])
+        self.report['elapsed'] = round(elapsed, 3)
+        self.report['hash_seconds'] = round(self.report['hash_seconds'], 3)
+        self.report['rows_per_second'] = round(self.report['rows'] / elapsed, 1) if elapsed else None
+        return self.report
+
+
+def provision_users(rows, workers=None, chunk_size=CHUNK_SIZE):
+    return Provisioner(workers, chunk_size).run(rows)
+
+
+def run_job(job_id, rows):
+    ProvisioningJob.objects.filter(id=job_id).update(status=ProvisioningJob.RUNNING)
+    try:
+        report = provision_users(rows)
+    except Exception:
+        logger.exception('Provisioning job %s failed.', job_id)
+        ProvisioningJob.objects.filter(id=job_id).update(
+            status=ProvisioningJob.FAILED, finished_at=timezone.now()
+        )
+    else:
+        ProvisioningJob.objects.filter(id=job_id).update(
+            status=ProvisioningJob.DONE, report=report, finished_at=timezone.now()
+        )
+
+
+def start_job(job, rows):
+    def work():
+        try:
+            run_job(job.id, rows)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=work, name=f'provisioning-{job.id}')
+    thread.start()
+    return thread
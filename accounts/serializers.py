@@ -2,6 +2,10 @@ from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from rest_framework import serializers
 
+from config.instrumentation import timed
+
+from .models import ProvisioningJob
+
 
 class SignUpSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
@@ -37,8 +41,15 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
     def validate(self, data):
-        user = authenticate(**data)
+        with timed('password'):
+            user = authenticate(**data)
         if not user:
             raise serializers.ValidationError("Invalid username or password.")
         data['user'] = user
         return data
+
+
+class ProvisioningJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProvisioningJob
+        fields = ['id', 'status', 'rows', 'report', 'created_at', 'finished_at']
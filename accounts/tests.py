@@ -1,3 +1,69 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase
+
+from . import views
+from .models import ProvisioningJob
+from .provisioning import provision_users, read_users, start_job
+
+
+class ProvisioningTests(TestCase):
+    def test_bad_rows_are_reported_without_aborting_the_batch(self):
+        User.objects.create_user('taken', 'taken@example.com')
+        lines = [
+            'username,email,password\n',
+            'alice,alice@example.com,secret123\n',
+            'taken,,secret123\n',
+            'bob,taken@example.com,secret123\n',
+            'alice,,secret123\n',
+            'carol,,\n',
+        ]
+        # One uniqueness check and one insert; the other two are the savepoint around it.
+        with self.assertNumQueries(4):
+            report = provision_users(read_users(lines), workers=1)
+
+        self.assertEqual((report['rows'], report['created'], report['failed']), (5, 2, 3))
+        self.assertEqual(
+            [(error['line'], error['errors']) for error in report['errors']],
+            [
+                (3, ['Username already exists.']),
+                (4, ['Email already exists.']),
+                (5, ['Username appears earlier in the file.']),
+            ]
+        )
+        self.assertTrue(User.objects.get(username='alice').check_password('secret123'))
+        self.assertFalse(User.objects.get(username='carol').has_usable_password())
+
+    def test_uploads_over_the_size_cap_are_refused(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+        content = b'username,email,password\nalice,,secret123\nbob,,secret123\ncarol,,\n'
+
+        def upload():
+            return self.client.post('/api/auth/provision/', {'file': SimpleUploadedFile('users.csv', content)})
+
+        with mock.patch.object(views, 'UPLOAD_MAX_BYTES', len(content) - 1):
+            self.assertEqual(upload().status_code, 413)
+        self.assertFalse(User.objects.filter(username='alice').exists())
+
+        response = upload()
+        self.assertEqual((response.status_code, response.json()['created']), (201, 3))
+
+
+class ProvisioningJobTests(TransactionTestCase):
+    def test_uploads_with_many_passwords_run_as_a_background_job(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+        content = b'username,email,password\nalice,,secret123\nbob,,secret123\ncarol,,\n'
+        threads = []
+
+        with mock.patch.object(views, 'INLINE_MAX_PASSWORDS', 1), \
+                mock.patch.object(views, 'start_job', side_effect=lambda *args: threads.append(start_job(*args))):
+            response = self.client.post('/api/auth/provision/', {'file': SimpleUploadedFile('users.csv', content)})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['rows'], 3)
+        threads[0].join(10)
+
+        job = self.client.get(response['Location']).json()
+        self.assertEqual((job['status'], job['report']['created']), (ProvisioningJob.DONE, 3))
+        self.assertTrue(User.objects.get(username='alice').check_password('secret123'))
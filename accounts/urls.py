@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import SignUpView, LoginView, LogoutView, MeView
+from .views import SignUpView, LoginView, LogoutView, MeView, ProvisionUsersView, ProvisioningJobView
 
 urlpatterns = [
     path('signup/', SignUpView.as_view(), name='signup'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('me/', MeView.as_view(), name='me'),
+    path('provision/', ProvisionUsersView.as_view(), name='provision_users'),
+    path('provision/<int:job_id>/', ProvisioningJobView.as_view(), name='provisioning_job'),
 ]
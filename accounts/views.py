@@ -1,12 +1,20 @@
+import codecs
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework import status
 from django.contrib.auth import login, logout
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils.decorators import method_decorator
 from django_ratelimit.decorators import ratelimit
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from .serializers import SignUpSerializer, LoginSerializer
+from .models import ProvisioningJob
+from .provisioning import INLINE_MAX_PASSWORDS, UPLOAD_MAX_BYTES, provision_users, read_users, start_job
+from .serializers import SignUpSerializer, LoginSerializer, ProvisioningJobSerializer
 
 
 class SignUpView(APIView):
@@ -50,3 +58,57 @@ class MeView(APIView):
             'first_name': request.user.first_name,
             'last_name': request.user.last_name,
         })
+
+
+class ProvisionUsersView(APIView):
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter(
+            'file', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True,
+            description=(
+                'CSV with username,email,password and optional first_name,last_name columns. '
+                f'Files with more than {INLINE_MAX_PASSWORDS} passwords are provisioned in the '
+                'background: the 202 response links to the job.'
+            )
+        ),
+    ], responses={201: 'Provisioning report', 202: ProvisioningJobSerializer})
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload a CSV as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+        if upload.size > UPLOAD_MAX_BYTES:
+            return self.too_large(f'over {UPLOAD_MAX_BYTES // 1024} KB')
+        try:
+            rows = list(read_users(codecs.iterdecode(upload, 'utf-8-sig')))
+        except UnicodeDecodeError:
+            return Response({'error': 'The file is not valid UTF-8.'}, status=status.HTTP_400_BAD_REQUEST)
+        if sum(1 for _, row in rows if row['password']) > INLINE_MAX_PASSWORDS:
+            job = ProvisioningJob.objects.create(requested_by=request.user, rows=len(rows))
+            start_job(job, rows)
+            return Response(
+                ProvisioningJobSerializer(job).data,
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Location': reverse('provisioning_job', args=[job.id])}
+            )
+        report = provision_users(rows)
+        return Response(
+            report,
+            status=status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST
+        )
+
+    def too_large(self, what):
+        return Response(
+            {'error': f'Files {what} must be provisioned with "manage.py provision_users".'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+
+class ProvisioningJobView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(responses={200: ProvisioningJobSerializer})
+    def get(self, request, job_id):
+        job = get_object_or_404(ProvisioningJob, id=job_id)
+        return Response(ProvisioningJobSerializer(job).data)
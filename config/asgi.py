@@ -2,6 +2,8 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP traffic goes to Django; WebSocket connections to /ws/attempts/<id>/ go
+to the live attempt channel in ``exams.realtime``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -12,5 +14,16 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Sync code called from async views runs on executor threads, and a connection left
+# open by one of them is never reused or closed. Django needs CONN_MAX_AGE=0 here.
+os.environ['DB_CONN_MAX_AGE'] = '0'
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from exams.realtime import attempt_socket  # noqa: E402  (needs the app registry)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await attempt_socket(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+# Bodies that gain nothing from another pass, e.g. the gzipped attempt export.
+PRECOMPRESSED_TYPES = {'application/gzip', 'application/zip', 'image/png', 'image/jpeg', 'image/webp'}
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware that leaves small and already compressed bodies alone."""
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').split(';')[0] in PRECOMPRESSED_TYPES:
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        return super().process_response(request, response)
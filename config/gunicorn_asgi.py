@@ -0,0 +1,17 @@
+"""
+Gunicorn launch profile for serving the project over ASGI with uvicorn workers.
+
+    gunicorn config.asgi:application -c config/gunicorn_asgi.py
+
+The async exam-taking endpoints live under /api/exams/async/, and the live
+attempt WebSocket under /ws/attempts/<id>/. Measure the difference against
+the WSGI path with ``python manage.py bench_concurrency``.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+worker_class = 'uvicorn_worker.UvicornWorker'
+keepalive = 5
+graceful_timeout = 30
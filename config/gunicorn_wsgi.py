@@ -0,0 +1,17 @@
+"""
+Gunicorn launch profile for the WSGI app, used by the Procfile.
+
+    gunicorn config.wsgi:application -c config/gunicorn_wsgi.py
+
+The app is loaded once in the master, which imports the project's modules and
+fills the exam caches before forking, so no worker pays for them on its first
+request. Bind address and worker count come from PORT and WEB_CONCURRENCY.
+"""
+
+preload_app = True
+
+
+def when_ready(server):
+    from exams.warmup import warm_worker
+
+    warm_worker()
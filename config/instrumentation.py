@@ -0,0 +1,213 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+BUCKETS_MS = [1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+current = ContextVar('request_timings', default=None)
+
+
+class Timings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.queries = 0
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def record_query(self, seconds):
+        self.queries += 1
+        self.add('db', seconds)
+
+    def header(self):
+        parts = []
+        for name, seconds in self.durations.items():
+            desc = f';desc="{self.queries} queries"' if name == 'db' else ''
+            parts.append(f'{name};dur={seconds * 1000:.2f}{desc}')
+        return ', '.join(parts)
+
+
+def query_hook(execute, sql, params, many, context):
+    timings = current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.record_query(time.perf_counter() - started)
+
+
+def install_query_hook(connection, **kwargs):
+    if query_hook not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_hook)
+
+
+@contextmanager
+def timed(name):
+    timings = current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value_ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.sum += value_ms
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.collectors = {}
+
+    def add_collector(self, name, collect):
+        """Report ``collect()``, a dict of numbers, under ``name`` alongside the timings."""
+        self.collectors[name] = collect
+
+    def collect(self):
+        return {name: collect() for name, collect in self.collectors.items()}
+
+    def observe(self, endpoint, timings):
+        with self.lock:
+            for metric, seconds in timings.durations.items():
+                histogram = self.histograms.setdefault((endpoint, metric), Histogram())
+                histogram.observe(seconds * 1000)
+            histogram = self.histograms.setdefault((endpoint, 'queries'), Histogram())
+            histogram.observe(timings.queries)
+
+    def snapshot(self):
+        with self.lock:
+            return [
+                {
+                    'endpoint': endpoint,
+                    'metric': metric,
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'buckets': dict(zip([*map(str, BUCKETS_MS), '+Inf'], histogram.counts)),
+                }
+                for (endpoint, metric), histogram in sorted(self.histograms.items())
+            ]
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+registry = Registry()
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # Wrappers are per connection and connections are per thread, so hook every
+        # connection and let the context variable decide which request a query belongs to.
+        connection_created.connect(install_query_hook, dispatch_uid='instrumentation_query_hook')
+        for connection in connections.all(initialized_only=True):
+            install_query_hook(connection)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings = Timings()
+        token = current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = Timings()
+        token = current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Load the session and user up front so their cost is attributed to them.
+        if hasattr(request, 'session'):
+            with timed('session'):
+                request.session.keys()
+        if hasattr(request, 'user'):
+            with timed('auth'):
+                request.user.is_authenticated
+
+    def finish(self, request, response, timings):
+        timings.add('total', time.perf_counter() - timings.started)
+        response['Server-Timing'] = timings.header()
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.view_name if match else 'unresolved'
+        registry.observe(endpoint, timings)
+        return response
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        lines = [
+            '# HELP exam_request_timing Per-endpoint request timings in ms (queries as a count).',
+            '# TYPE exam_request_timing histogram',
+        ]
+        for item in data['timings']:
+            labels = f'endpoint="{item["endpoint"]}",metric="{item["metric"]}"'
+            cumulative = 0
+            for bound, count in item['buckets'].items():
+                cumulative += count
+                lines.append(f'exam_request_timing_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'exam_request_timing_sum{{{labels}}} {item["sum"]}')
+            lines.append(f'exam_request_timing_count{{{labels}}} {item["count"]}')
+        for name, values in data.items():
+            if name == 'timings':
+                continue
+            lines.append(f'# TYPE exam_{name} gauge')
+            for stat, value in values.items():
+                lines.append(f'exam_{name}{{stat="{stat}"}} {value}')
+        return ('\n'.join(lines) + '\n').encode(self.charset)
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+    renderer_classes = [JSONRenderer, PrometheusRenderer]
+
+    def get(self, request):
+        return Response({'timings': registry.snapshot(), **registry.collect()})
@@ -0,0 +1,52 @@
+import msgpack
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+# A module import: instrumentation's APIView pulls in these renderers through DRF settings.
+from . import instrumentation
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Leave datetimes to DRF's encoder so both renderers emit the same strings.
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+    if orjson else 0
+)
+encode_default = JSONEncoder().default
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer on orjson, producing the same compact output; falls back to DRF's encoder."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with instrumentation.timed('serialize'):
+            return self.encode(data, accepted_media_type, renderer_context)
+
+    def encode(self, data, accepted_media_type, renderer_context):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits and the like.
+            return super().render(data, accepted_media_type, renderer_context)
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with instrumentation.timed('serialize'):
+            return msgpack.packb(data, default=encode_default)
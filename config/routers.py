@@ -0,0 +1,33 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def read_from_replica():
+    token = replica_reads.set(True)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads inside read_from_replica() to the replica; everything else stays on the primary."""
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and REPLICA_DB_ALIAS in connections.settings:
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Without this, saving an instance loaded from the replica would write to it.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -33,6 +33,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.instrumentation.PerformanceMiddleware',
+    'config.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -65,10 +67,33 @@ WSGI_APPLICATION = 'config.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DB_PATH', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            # WAL lets readers run alongside the single writer instead of blocking on it.
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'timeout': float(os.environ.get('DB_BUSY_TIMEOUT', '20')),
+            # Take the write lock when a transaction starts, so it waits out the busy
+            # timeout instead of failing with "database is locked" on its first write.
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Persistent connections for WSGI workers; config/asgi.py forces 0.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Result lookups route through config.routers to this alias when it is configured; exam
+# papers are cached for a day, so they are always rendered from the primary.
+# Locally, a copy made with `sqlite3 db.sqlite3 ".backup replica.sqlite3"` stands in for it.
+if os.environ.get('DB_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DB_REPLICA_PATH'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['config.routers.ReplicaRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -85,6 +110,13 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Written by `manage.py warm_up` and served by WhiteNoise; until it exists the docs
+# page generates the schema on every hit.
+OPENAPI_SCHEMA_PATH = STATIC_ROOT / 'openapi.json'
+SWAGGER_SETTINGS = {
+    'SPEC_URL': f'/{STATIC_URL}{OPENAPI_SCHEMA_PATH.name}' if OPENAPI_SCHEMA_PATH.exists() else None,
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
@@ -92,10 +124,45 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'config.renderers.FastJSONRenderer',
+        'config.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# With REDIS_URL set every worker shares one cache: the exam caches, sessions and
+# rate-limit counters. Without it each process keeps its own local memory cache.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+# Without a shared cache, entries other processes may invalidate expire within seconds.
+SHARED_CACHE = bool(REDIS_URL)
+
+# cached_db reads sessions from the cache and only falls back to the database, but it
+# needs a shared cache: a per-process cache would keep serving sessions after logout.
+SESSION_ENGINE = os.environ.get(
+    'SESSION_ENGINE',
+    'django.contrib.sessions.backends.cached_db' if REDIS_URL else 'django.contrib.sessions.backends.db',
+)
+
 CSRF_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_HTTPONLY = False
 
+# Responses smaller than this go out uncompressed; gzip framing would eat the saving.
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+PERF_INSTRUMENTATION = os.environ.get('PERF_INSTRUMENTATION', 'False') == 'True'
+
+ANSWER_WRITE_BEHIND = os.environ.get('ANSWER_WRITE_BEHIND', 'False') == 'True'
+ANSWER_JOURNAL_PATH = os.environ.get('ANSWER_JOURNAL_PATH', BASE_DIR / 'answers.journal')
+ANSWER_JOURNAL_FLUSH_INTERVAL = float(os.environ.get('ANSWER_JOURNAL_FLUSH_INTERVAL', '2'))
+
+RATELIMIT_USE_CACHE = 'default'
 RATELIMIT_EXCEPTION_HANDLER = 'django_ratelimit.exceptions.Ratelimited'
@@ -4,13 +4,16 @@ from django.http import JsonResponse
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from .instrumentation import MetricsView
+
+api_info = openapi.Info(
+    title="Exam System API",
+    default_version='v1',
+    description="REST API for the Exam System",
+)
 
 schema_view = get_schema_view(
-    openapi.Info(
-        title="Exam System API",
-        default_version='v1',
-        description="REST API for the Exam System",
-    ),
+    api_info,
     public=True,
     permission_classes=[permissions.AllowAny],
 )
@@ -22,5 +25,6 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/exams/', include('exams.urls')),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
     path('api/docs/', schema_view.with_ui('swagger', cache_timeout=0), name='swagger-ui'),
 ]
@@ -0,0 +1,213 @@
+import numpy as np
+from django.core.cache import cache
+
+from .caching import CACHE_TIMEOUT, cache_timeout, get_exam_version
+from .grading import get_answer_key
+from .models import Answer, ExamAttempt
+from .packing import unpack_ids
+
+ANALYTICS_KEY = 'exams:analytics:{exam_id}:{version}'
+PERCENTILES = [10, 25, 50, 75, 90]
+CHUNK_SIZE = 10000
+
+
+class ItemStatistics:
+    """Running sufficient statistics for one exam's submitted attempts.
+
+    Per-question figures are over the attempts that were given the question: with
+    a question pool, each attempt only sees the questions drawn for it.
+    """
+
+    def __init__(self, answer_key):
+        choices = sorted(answer_key.choices.items())
+        self.choice_ids = np.array([choice_id for choice_id, _ in choices], dtype=np.int64)
+        self.question_ids = np.unique(
+            np.array([question_id for _, question_id in choices], dtype=np.int64)
+        )
+        self.choice_question = np.searchsorted(
+            self.question_ids, np.array([question_id for _, question_id in choices], dtype=np.int64)
+        )
+        self.choice_correct = np.isin(self.choice_ids, list(answer_key.correct))
+
+        questions = len(self.question_ids)
+        self.attempt_ids = np.empty(0, dtype=np.int64)
+        self.correct_counts = np.zeros(questions, dtype=np.int64)
+        self.answered_counts = np.zeros(questions, dtype=np.int64)
+        self.exposed_counts = np.zeros(questions, dtype=np.int64)
+        self.correct_score_sums = np.zeros(questions, dtype=np.float64)
+        self.exposed_score_sums = np.zeros(questions, dtype=np.float64)
+        self.exposed_score_square_sums = np.zeros(questions, dtype=np.float64)
+        self.choice_counts = np.zeros(len(self.choice_ids), dtype=np.int64)
+        self.score_histogram = np.zeros(questions + 1, dtype=np.int64)
+        self.score_sum = 0.0
+        self.score_square_sum = 0.0
+
+    @property
+    def count(self):
+        return len(self.attempt_ids)
+
+    def add(self, attempt_ids, answer_attempt_ids, answer_choice_ids, drawn=None):
+        """Add a batch of attempts; ``drawn`` maps a pooled attempt's id to the question ids it got."""
+        attempt_ids = np.unique(np.asarray(attempt_ids, dtype=np.int64))
+        answer_attempt_ids = np.asarray(answer_attempt_ids, dtype=np.int64)
+        answer_choice_ids = np.asarray(answer_choice_ids, dtype=np.int64)
+
+        exposed = np.ones((len(attempt_ids), len(self.question_ids)), dtype=bool)
+        if drawn:
+            pooled_ids = np.fromiter(drawn, dtype=np.int64, count=len(drawn))
+            drawn_attempt_ids = np.repeat(pooled_ids, [len(question_ids) for question_ids in drawn.values()])
+            drawn_question_ids = np.fromiter(
+                (question_id for question_ids in drawn.values() for question_id in question_ids),
+                dtype=np.int64, count=len(drawn_attempt_ids),
+            )
+            exposed[np.searchsorted(attempt_ids, pooled_ids[np.isin(pooled_ids, attempt_ids)])] = False
+            # Skip attempts outside this batch and questions deleted since the draw.
+            known = np.isin(drawn_attempt_ids, attempt_ids) & np.isin(drawn_question_ids, self.question_ids)
+            exposed[
+                np.searchsorted(attempt_ids, drawn_attempt_ids[known]),
+                np.searchsorted(self.question_ids, drawn_question_ids[known]),
+            ] = True
+
+        # Drop rows for attempts outside this batch and choices no longer on the paper.
+        known = np.isin(answer_attempt_ids, attempt_ids) & np.isin(answer_choice_ids, self.choice_ids)
+        choice_index = np.searchsorted(self.choice_ids, answer_choice_ids[known])
+        row = np.searchsorted(attempt_ids, answer_attempt_ids[known])
+        column = self.choice_question[choice_index]
+
+        responses = np.full((len(attempt_ids), len(self.question_ids)), -1, dtype=np.int64)
+        responses[row, column] = choice_index
+        answered = (responses >= 0) & exposed
+        correct = answered & self.choice_correct[np.where(answered, responses, 0)]
+        scores = correct.sum(axis=1)
+
+        self.attempt_ids = np.union1d(self.attempt_ids, attempt_ids)
+        self.correct_counts += correct.sum(axis=0)
+        self.answered_counts += answered.sum(axis=0)
+        self.exposed_counts += exposed.sum(axis=0)
+        self.correct_score_sums += (correct * scores[:, None]).sum(axis=0)
+        self.exposed_score_sums += (exposed * scores[:, None]).sum(axis=0)
+        self.exposed_score_square_sums += (exposed * (scores.astype(np.float64) ** 2)[:, None]).sum(axis=0)
+        self.choice_counts += np.bincount(responses[answered], minlength=len(self.choice_ids))
+        self.score_histogram += np.bincount(scores, minlength=len(self.question_ids) + 1)
+        self.score_sum += float(scores.sum())
+        self.score_square_sum += float((scores.astype(np.float64) ** 2).sum())
+
+    def report(self):
+        n = self.count
+        mean = self.score_sum / n if n else 0.0
+        std = np.sqrt(max(self.score_square_sum / n - mean ** 2, 0.0)) if n else 0.0
+
+        exposed = self.exposed_counts
+        with np.errstate(divide='ignore', invalid='ignore'):
+            difficulty = self.correct_counts / exposed
+            wrong = exposed - self.correct_counts
+            mean_correct = self.correct_score_sums / self.correct_counts
+            mean_wrong = (self.exposed_score_sums - self.correct_score_sums) / wrong
+            mean_exposed = self.exposed_score_sums / exposed
+            std_exposed = np.sqrt(np.maximum(self.exposed_score_square_sums / exposed - mean_exposed ** 2, 0.0))
+            discrimination = (mean_correct - mean_wrong) / std_exposed * np.sqrt(difficulty * (1 - difficulty))
+            share = self.choice_counts / exposed[self.choice_question]
+
+        cumulative = np.cumsum(self.score_histogram)
+        percentiles = {
+            str(pct): int(np.searchsorted(cumulative, max(np.ceil(pct / 100 * n), 1))) if n else None
+            for pct in PERCENTILES
+        }
+
+        questions = []
+        for index, question_id in enumerate(self.question_ids):
+            in_question = np.flatnonzero(self.choice_question == index)
+            questions.append({
+                'question_id': int(question_id),
+                'exposed': int(exposed[index]),
+                'answered': int(self.answered_counts[index]),
+                'difficulty': float(difficulty[index]) if exposed[index] else None,
+                'discrimination': (
+                    float(discrimination[index]) if np.isfinite(discrimination[index]) else None
+                ),
+                'choices': [
+                    {
+                        'choice_id': int(self.choice_ids[choice]),
+                        'is_correct': bool(self.choice_correct[choice]),
+                        'count': int(self.choice_counts[choice]),
+                        'share': float(share[choice]) if exposed[index] else None,
+                    }
+                    for choice in in_question
+                ],
+            })
+
+        return {
+            'attempts': n,
+            'scores': {
+                'mean': mean,
+                'std': float(std),
+                'histogram': self.score_histogram.tolist(),
+                'percentiles': percentiles,
+            },
+            'questions': questions,
+        }
+
+
+def load_answers(exam_id, attempt_ids, cold):
+    if cold:
+        # Everything is new: read the whole exam in one pass. Attempts submitted since
+        # the id snapshot are dropped by ItemStatistics.add and picked up next time.
+        batches = [ExamAttempt.objects.filter(exam_id=exam_id, is_submitted=True)]
+    else:
+        batches = [
+            ExamAttempt.objects.filter(id__in=attempt_ids[start:start + CHUNK_SIZE].tolist())
+            for start in range(0, len(attempt_ids), CHUNK_SIZE)
+        ]
+
+    packed_ids, packed, unpacked_ids, drawn = [], [], [], {}
+    for attempts in batches:
+        rows = attempts.order_by().values_list('id', 'drawn_questions', 'packed_answers')
+        for attempt_id, drawn_questions, data in rows:
+            if drawn_questions is not None:
+                drawn[attempt_id] = unpack_ids(drawn_questions)
+            if data is None:
+                unpacked_ids.append(attempt_id)
+            else:
+                packed_ids.append(attempt_id)
+                packed.append(bytes(data))
+
+    # exams.packing stores little-endian int64 choice ids.
+    lengths = [len(data) // 8 for data in packed]
+    attempt_parts = [np.repeat(np.array(packed_ids, dtype=np.int64), lengths)]
+    choice_parts = [np.frombuffer(b''.join(packed), dtype='<i8').astype(np.int64)]
+
+    # Attempts finalized before answers were packed still keep Answer rows.
+    for start in range(0, len(unpacked_ids), CHUNK_SIZE):
+        rows = np.array(
+            list(
+                Answer.objects.filter(attempt_id__in=unpacked_ids[start:start + CHUNK_SIZE])
+                .values_list('attempt_id', 'choice_id')
+            ),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        attempt_parts.append(rows[:, 0])
+        choice_parts.append(rows[:, 1])
+
+    return np.concatenate(attempt_parts), np.concatenate(choice_parts), drawn
+
+
+def get_item_statistics(exam_id):
+    key = ANALYTICS_KEY.format(exam_id=exam_id, version=get_exam_version(exam_id))
+    statistics = cache.get(key)
+    if statistics is None:
+        statistics = ItemStatistics(get_answer_key(exam_id))
+
+    submitted = np.fromiter(
+        ExamAttempt.objects.filter(exam_id=exam_id, is_submitted=True)
+        .order_by()
+        .values_list('id', flat=True),
+        dtype=np.int64,
+    )
+    if len(np.setdiff1d(statistics.attempt_ids, submitted, assume_unique=True)):
+        # An included attempt was deleted; its contribution cannot be subtracted.
+        statistics = ItemStatistics(get_answer_key(exam_id))
+    new_ids = np.setdiff1d(submitted, statistics.attempt_ids, assume_unique=True)
+    if len(new_ids):
+        statistics.add(new_ids, *load_answers(exam_id, new_ids, cold=not statistics.count))
+        cache.set(key, statistics, cache_timeout(CACHE_TIMEOUT))
+    return statistics
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class ExamsConfig(AppConfig):
     name = 'exams'
+
+    def ready(self):
+        from config.instrumentation import registry
+
+        from . import signals  # noqa: F401
+        from .journal import journal
+
+        registry.add_collector('answer_journal', journal.get_stats)
@@ -0,0 +1,155 @@
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+
+from .attempt_state import get_attempt_state, save_answers
+from .caching import (
+    DEFAULT_RENDERER, RESULT_TIMEOUT, bytes_response, cache_result, get_cached_result, get_renderer
+)
+from .grading import finalize_attempt, invalid_answers
+from .idempotency import idempotent
+from .models import Exam, ExamAttempt
+from .serializers import AttemptResultSerializer, SaveAnswerSerializer
+from .views import auto_submit_if_expired, get_saved_answers, open_attempt
+
+
+def json_response(data, status=200):
+    return HttpResponse(DEFAULT_RENDERER.render(data), status=status, content_type='application/json')
+
+
+def not_found():
+    return json_response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+
+def authenticated(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return json_response(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def resume(attempt):
+    if await sync_to_async(auto_submit_if_expired)(attempt):
+        return json_response(
+            {'error': 'Your previous attempt expired and was auto-submitted.'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    return json_response({
+        'attempt_id': attempt.id,
+        'ends_at': attempt.ends_at,
+        'saved_answers': await sync_to_async(get_saved_answers)(attempt),
+        'message': 'Resuming existing attempt.'
+    })
+
+
+@require_POST
+@authenticated
+@idempotent
+async def start_exam(request, exam_id):
+    exam = await Exam.objects.filter(id=exam_id, is_active=True).afirst()
+    if exam is None:
+        return not_found()
+
+    existing = await ExamAttempt.objects.filter(
+        user=request.user, exam=exam, is_submitted=False
+    ).afirst()
+    if existing:
+        return await resume(existing)
+
+    attempt, created = await sync_to_async(open_attempt)(request.user, exam)
+    if attempt is None:
+        return json_response(
+            {'error': 'Maximum attempts reached.'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    if not created:
+        return await resume(attempt)
+
+    return json_response({
+        'attempt_id': attempt.id,
+        'ends_at': attempt.ends_at,
+        'saved_answers': {},
+        'message': 'Exam started.'
+    }, status=status.HTTP_201_CREATED)
+
+
+@require_POST
+@authenticated
+@idempotent
+async def save_answer(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return json_response({'detail': 'Malformed JSON.'}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = SaveAnswerSerializer(data=data)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    attempt_id = serializer.validated_data['attempt_id']
+    state = await sync_to_async(get_attempt_state)(attempt_id)
+    if state is None or state['user_id'] != request.user.id or state['is_submitted']:
+        return not_found()
+
+    if timezone.now() > state['ends_at']:
+        attempt = await ExamAttempt.objects.aget(id=attempt_id)
+        await sync_to_async(auto_submit_if_expired)(attempt)
+        return json_response(
+            {'error': 'Time expired. Your exam has been auto-submitted.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    question_id = serializer.validated_data['question_id']
+    choice_id = serializer.validated_data['choice_id']
+    if await sync_to_async(invalid_answers)(state, {question_id: choice_id}):
+        return not_found()
+
+    if not await sync_to_async(save_answers)(attempt_id, {question_id: choice_id}):
+        return not_found()
+    return json_response({'status': 'ok'})
+
+
+@require_POST
+@authenticated
+@idempotent
+async def submit_exam(request, exam_id):
+    attempt = await ExamAttempt.objects.select_related('exam').filter(
+        user=request.user, exam_id=exam_id, is_submitted=False
+    ).afirst()
+    if attempt is None:
+        return not_found()
+
+    await sync_to_async(finalize_attempt)(attempt)
+
+    renderer = get_renderer(request)
+    _, content = await sync_to_async(cache_result)(attempt, renderer)
+    return bytes_response(request, content, renderer=renderer)
+
+
+@require_GET
+@authenticated
+async def exam_result(request, attempt_id):
+    renderer = get_renderer(request)
+    result = await sync_to_async(get_cached_result)(request.user.id, attempt_id, renderer)
+    if result is None:
+        attempt = await ExamAttempt.objects.select_related('exam').filter(
+            id=attempt_id, user=request.user
+        ).afirst()
+        if attempt is None:
+            return not_found()
+        if not attempt.is_submitted:
+            return json_response(AttemptResultSerializer(attempt).data)
+        result = await sync_to_async(cache_result)(attempt, renderer)
+
+    etag, content = result
+    return bytes_response(request, content, etag, max_age=RESULT_TIMEOUT, renderer=renderer)
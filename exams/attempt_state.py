@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .journal import journal, upsert_answers, upsert_open_answers, write_behind_enabled
+from .models import Answer, ExamAttempt
+
+ATTEMPT_STATE_KEY = 'exams:attempt:{attempt_id}'
+STATE_GRACE = 5 * 60
+
+
+def _timeout(state):
+    remaining = (state['ends_at'] - timezone.now()).total_seconds()
+    return max(int(remaining) + STATE_GRACE, 60)
+
+
+def _store(attempt_id, state):
+    if not state['is_submitted']:
+        cache.set(ATTEMPT_STATE_KEY.format(attempt_id=attempt_id), state, _timeout(state))
+
+
+def build_attempt_state(attempt):
+    # Answers stay out of the cached state: merging them in would be a get/modify/set
+    # that concurrent saves race on. Resume reads them from the table instead.
+    state = {
+        'user_id': attempt.user_id,
+        'exam_id': attempt.exam_id,
+        'ends_at': attempt.ends_at,
+        'is_submitted': attempt.is_submitted,
+        'seed': attempt.seed,
+        # Checked on every save and dealt in this order on the attempt's paper.
+        'drawn': attempt.drawn_question_ids,
+    }
+    _store(attempt.id, state)
+    return state
+
+
+def get_attempt_state(attempt_id, attempt=None):
+    state = cache.get(ATTEMPT_STATE_KEY.format(attempt_id=attempt_id))
+    if state is None:
+        if attempt is None:
+            attempt = ExamAttempt.objects.filter(id=attempt_id).first()
+            if attempt is None:
+                return None
+        state = build_attempt_state(attempt)
+    return state
+
+
+def _saved_answers(attempt_id):
+    return dict(Answer.objects.filter(attempt_id=attempt_id).values_list('question_id', 'choice_id'))
+
+
+def load_saved_answers(attempt_id):
+    """Return ``{question_id: choice_id}`` saved so far for an open attempt."""
+    if write_behind_enabled():
+        # Flushing the whole journal here would make every resume wait on everyone's saves.
+        return journal.overlay(attempt_id, lambda: _saved_answers(attempt_id))
+    return _saved_answers(attempt_id)
+
+
+def save_answers(attempt_id, answers):
+    """Save answers for an open attempt; returns False if it was finalized meanwhile.
+
+    A shared cache loses the state as soon as the attempt is finalized, so the write
+    trusts it. A per-process cache can be stale, e.g. when another worker saw the
+    submit, so the write itself checks the attempt is still open. The write-behind
+    journal does the same check when it flushes.
+    """
+    if write_behind_enabled():
+        journal.append(attempt_id, answers)
+        return True
+    rows = [(attempt_id, question_id, choice_id) for question_id, choice_id in answers.items()]
+    if settings.SHARED_CACHE:
+        # A save racing the finalize can leave a row behind; packed answers take precedence.
+        upsert_answers(rows)
+        return True
+    saved = upsert_open_answers(rows)
+    if not saved:
+        invalidate_attempt_state(attempt_id)
+    return bool(saved)
+
+
+def invalidate_attempt_state(*attempt_ids):
+    cache.delete_many([ATTEMPT_STATE_KEY.format(attempt_id=attempt_id) for attempt_id in attempt_ids])
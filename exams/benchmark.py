@@ -0,0 +1,225 @@
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+)
+from django.utils.text import compress_string
+
+from .models import Choice, Course, Exam, Question
+
+
+@contextmanager
+def throwaway_database():
+    old_name = connection.settings_dict['NAME']
+    if connection.vendor == 'sqlite':
+        # Concurrent threads need a real file; shared-cache memory databases lock whole tables.
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        connection.settings_dict['TEST']['NAME'] = path
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    for alias in connections:
+        if connections[alias].settings_dict['TEST'].get('MIRROR') == DEFAULT_DB_ALIAS:
+            connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_exam(title='Benchmark exam', questions=20, choices=4, duration=60, course=None):
+    if course is None:
+        course = Course.objects.create(title=f'{title} course')
+    exam = Exam.objects.create(
+        course=course, title=title, duration=duration,
+        total_marks=questions, max_attempts=0
+    )
+    question_objs = Question.objects.bulk_create(
+        [Question(exam=exam, text=f'Question {i + 1}') for i in range(questions)]
+    )
+    Choice.objects.bulk_create([
+        Choice(question=question, text=f'Choice {j + 1}', is_correct=j == 0)
+        for question in question_objs
+        for j in range(choices)
+    ])
+    Exam.update_question_counts([exam.id])
+    exam.refresh_from_db()
+    return exam
+
+
+def seed_catalog(courses=1, exams=1, questions=20, choices=4):
+    catalog = []
+    for i in range(courses):
+        course = Course.objects.create(title=f'Benchmark course {i + 1}')
+        for j in range(exams):
+            catalog.append(seed_exam(
+                title=f'Benchmark exam {i + 1}.{j + 1}',
+                questions=questions, choices=choices, course=course
+            ))
+    return catalog
+
+
+def seed_candidates(count, prefix='candidate', password='benchmark-pass'):
+    password_hash = make_password(password)
+    return User.objects.bulk_create([
+        User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password=password_hash)
+        for i in range(count)
+    ])
+
+
+def answer_plan(exam, count):
+    plan = []
+    for question in exam.questions.prefetch_related('choices')[:count]:
+        plan.append({'question_id': question.id, 'choice_id': question.choices.all()[0].id})
+    return plan
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    return {
+        'requests': len(latencies),
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+
+    def request(self, endpoint, client, method, path, data=None):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, data, content_type='application/json')
+            self.latencies[endpoint].append(time.perf_counter() - started)
+        self.queries[endpoint].append(len(context.captured_queries))
+        if response.status_code >= 400:
+            raise RuntimeError(f'{endpoint} returned {response.status_code}: {response.content[:200]!r}')
+        return response
+
+    def report(self, elapsed):
+        report = {}
+        for endpoint, latencies in self.latencies.items():
+            stats = summarize(latencies, elapsed)
+            stats['queries_mean'] = statistics.fmean(self.queries[endpoint])
+            stats['queries_max'] = max(self.queries[endpoint])
+            report[endpoint] = stats
+        return report
+
+
+def simulate(exams, candidates, saves, password='benchmark-pass'):
+    """Drive each candidate through signup, login, start, autosaves and submit."""
+    recorder = Recorder()
+    plans = {exam.id: answer_plan(exam, saves) for exam in exams}
+    started = time.perf_counter()
+    for i in range(candidates):
+        exam = exams[i % len(exams)]
+        # A distinct address per candidate keeps the per-IP login rate limit out of the numbers.
+        client = Client(REMOTE_ADDR=f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}')
+        username = f'loadtest{i}'
+        recorder.request('signup', client, 'post', '/api/auth/signup/', {
+            'username': username, 'email': f'{username}@example.com',
+            'password': password, 'password_confirm': password,
+        })
+        client.post('/api/auth/logout/')
+        recorder.request('login', client, 'post', '/api/auth/login/', {
+            'username': username, 'password': password,
+        })
+        recorder.request('exam_list', client, 'get', '/api/exams/')
+        recorder.request('exam_detail', client, 'get', f'/api/exams/{exam.id}/')
+        response = recorder.request('start', client, 'post', f'/api/exams/{exam.id}/start/')
+        attempt_id = response.json()['attempt_id']
+        for answer in plans[exam.id]:
+            recorder.request('save_answer', client, 'post', '/api/exams/save-answer/', {
+                'attempt_id': attempt_id, **answer,
+            })
+        recorder.request('submit', client, 'post', f'/api/exams/{exam.id}/submit/')
+        recorder.request('result', client, 'get', f'/api/exams/result/{attempt_id}/')
+    return recorder.report(time.perf_counter() - started)
+
+
+AUTH_TABLES = {'session': '"django_session"', 'user': '"auth_user"'}
+
+
+def session_overhead(engine, user, requests, paths=('/api/auth/me/', '/api/exams/')):
+    """Measure per-request queries and latency of authenticated GETs under one session engine."""
+    with override_settings(SESSION_ENGINE=engine):
+        client = Client()
+        client.force_login(user)
+        client.get(paths[0])
+        latencies = []
+        queries = defaultdict(int)
+        started = time.perf_counter()
+        for i in range(requests):
+            with CaptureQueriesContext(connection) as context:
+                request_started = time.perf_counter()
+                response = client.get(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - request_started)
+            if response.status_code != 200:
+                raise RuntimeError(f'{paths[i % len(paths)]} returned {response.status_code}')
+            for query in context.captured_queries:
+                kind = next((kind for kind, table in AUTH_TABLES.items() if table in query['sql']), 'other')
+                queries[kind] += 1
+        stats = summarize(latencies, time.perf_counter() - started)
+    stats.update({f'{kind}_queries': queries[kind] / requests for kind in [*AUTH_TABLES, 'other']})
+    return stats
+
+
+def encoding_overhead(payloads, renderers, rounds):
+    """Bytes on the wire and encode time per response for each payload under each renderer."""
+    report = {}
+    for payload, data in payloads.items():
+        report[payload] = {}
+        for name, renderer in renderers.items():
+            started = time.perf_counter()
+            for _ in range(rounds):
+                content = renderer.render(data)
+            encode = (time.perf_counter() - started) / rounds
+            started = time.perf_counter()
+            compressed = compress_string(content)
+            compress = time.perf_counter() - started
+            report[payload][name] = {
+                'bytes': len(content),
+                'gzip_bytes': len(compressed),
+                'encode_us': encode * 1e6,
+                'gzip_us': compress * 1e6,
+            }
+    return report
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for endpoint, stats in report.items():
+        previous = baseline.get(endpoint)
+        if previous is None:
+            continue
+        if stats['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{endpoint}: p95 {stats['p95_ms']:.1f}ms vs {previous['p95_ms']:.1f}ms baseline"
+            )
+        if stats['queries_max'] > previous['queries_max']:
+            regressions.append(
+                f"{endpoint}: {stats['queries_max']} queries vs {previous['queries_max']} baseline"
+            )
+    return regressions
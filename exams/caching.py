@@ -0,0 +1,148 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+
+from config.renderers import FastJSONRenderer, MessagePackRenderer
+
+from .models import Exam, Question
+from .serializers import AttemptResultSerializer, ExamDetailSerializer, ExamSerializer
+
+CACHE_TIMEOUT = 60 * 60 * 24
+RESULT_TIMEOUT = 60 * 60 * 24 * 30
+# A per-process cache never sees the bumps and deletes made by other processes, so
+# without a shared cache versions and the entries cached under them lapse this fast.
+LOCAL_CACHE_TIMEOUT = 5
+
+EXAM_VERSION_KEY = 'exams:version:{exam_id}'
+EXAM_PAPER_KEY = 'exams:paper:{exam_id}:{version}:{format}'
+EXAM_LIST_VERSION_KEY = 'exams:list_version'
+EXAM_LIST_KEY = 'exams:list:{version}:{format}'
+RESULT_KEY = 'exams:result:{user_id}:{attempt_id}:{format}'
+
+# The byte caches hold one rendering per format.
+RENDERERS = {renderer.format: renderer() for renderer in (FastJSONRenderer, MessagePackRenderer)}
+DEFAULT_RENDERER = RENDERERS['json']
+
+
+def cache_timeout(timeout):
+    if settings.SHARED_CACHE:
+        return timeout
+    return LOCAL_CACHE_TIMEOUT if timeout is None else min(timeout, LOCAL_CACHE_TIMEOUT)
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, cache_timeout(None)):
+            version = cache.get(key) or version
+    return version
+
+
+def bump_version(key):
+    cache.set(key, uuid.uuid4().hex, cache_timeout(None))
+
+
+def get_exam_version(exam_id):
+    return get_version(EXAM_VERSION_KEY.format(exam_id=exam_id))
+
+
+def bump_exam_version(exam_id):
+    bump_version(EXAM_VERSION_KEY.format(exam_id=exam_id))
+
+
+def bump_exam_list_version():
+    bump_version(EXAM_LIST_VERSION_KEY)
+
+
+def make_etag(content):
+    return quote_etag(hashlib.sha1(content).hexdigest())
+
+
+def get_renderer(request):
+    """MessagePack for clients that ask for it, JSON for everyone else."""
+    accepted = getattr(request, 'accepted_renderer', None)
+    if accepted is not None:
+        return RENDERERS.get(accepted.format, DEFAULT_RENDERER)
+    if MessagePackRenderer.media_type in request.headers.get('Accept', ''):
+        return RENDERERS['msgpack']
+    return DEFAULT_RENDERER
+
+
+def render(data, renderer=DEFAULT_RENDERER):
+    return renderer.render(data)
+
+
+def get_exam_paper(exam_id, renderer=DEFAULT_RENDERER):
+    version = get_exam_version(exam_id)
+    key = EXAM_PAPER_KEY.format(exam_id=exam_id, version=version, format=renderer.format)
+    paper = cache.get(key)
+    if paper is None:
+        exam = Exam.objects.filter(id=exam_id, is_active=True).select_related('course').first()
+        if exam is None:
+            raise Http404
+        # Pooled exams hand each attempt its own draw; the shared paper must not list the bank.
+        questions = (
+            Question.objects.none() if exam.questions_per_attempt
+            else Question.objects.prefetch_related('choices')
+        )
+        prefetch_related_objects([exam], Prefetch('questions', queryset=questions))
+        content = render(ExamDetailSerializer(exam).data, renderer)
+        paper = (make_etag(content), content)
+        cache.set(key, paper, cache_timeout(CACHE_TIMEOUT))
+    return paper
+
+
+def get_exam_list(renderer=DEFAULT_RENDERER):
+    key = EXAM_LIST_KEY.format(version=get_version(EXAM_LIST_VERSION_KEY), format=renderer.format)
+    listing = cache.get(key)
+    if listing is None:
+        exams = Exam.objects.filter(is_active=True).select_related('course')
+        content = render(ExamSerializer(exams, many=True).data, renderer)
+        listing = (make_etag(content), content)
+        cache.set(key, listing, cache_timeout(CACHE_TIMEOUT))
+    return listing
+
+
+def get_cached_result(user_id, attempt_id, renderer=DEFAULT_RENDERER):
+    return cache.get(RESULT_KEY.format(user_id=user_id, attempt_id=attempt_id, format=renderer.format))
+
+
+def cache_result(attempt, renderer=DEFAULT_RENDERER):
+    content = render(AttemptResultSerializer(attempt).data, renderer)
+    result = (make_etag(content), content)
+    cache.set(
+        RESULT_KEY.format(user_id=attempt.user_id, attempt_id=attempt.id, format=renderer.format),
+        result, cache_timeout(RESULT_TIMEOUT)
+    )
+    return result
+
+
+def delete_cached_result(attempt):
+    cache.delete_many([
+        RESULT_KEY.format(user_id=attempt.user_id, attempt_id=attempt.id, format=renderer_format)
+        for renderer_format in RENDERERS
+    ])
+
+
+def bytes_response(request, content, etag=None, max_age=None, renderer=DEFAULT_RENDERER):
+    # Compression downgrades our ETags to weak ones, so compare weakly.
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag and etag in {tag.removeprefix('W/') for tag in if_none_match}:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=renderer.media_type)
+    patch_vary_headers(response, ['Accept'])
+    if etag:
+        response['ETag'] = etag
+        if max_age is None:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, private=True, max_age=max_age, immutable=True)
+    return response
@@ -0,0 +1,125 @@
+import csv
+import zlib
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .grading import get_answer_key
+from .models import Answer, ExamAttempt
+
+CHUNK_SIZE = 2000
+FORMATS = ('csv', 'jsonl')
+CSV_HEADER = [
+    'attempt_id', 'exam_id', 'exam_title', 'user_id', 'username', 'started_at', 'ends_at',
+    'is_submitted', 'score', 'question_id', 'choice_id', 'is_correct',
+]
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def parse_bound(value):
+    """Parse an ISO date or datetime filter; a bare date means midnight."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        parsed = datetime.combine(day, time.min)
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    elif not settings.USE_TZ and timezone.is_aware(parsed):
+        parsed = timezone.make_naive(parsed)
+    return parsed
+
+
+def export_queryset(exam_id=None, since=None, until=None):
+    attempts = ExamAttempt.objects.select_related('user', 'exam').prefetch_related(
+        Prefetch('answers', queryset=Answer.objects.order_by('question_id').only(
+            'attempt_id', 'question_id', 'choice_id'
+        ))
+    ).order_by('id')
+    if exam_id is not None:
+        attempts = attempts.filter(exam_id=exam_id)
+    if since is not None:
+        attempts = attempts.filter(started_at__gte=since)
+    if until is not None:
+        attempts = attempts.filter(started_at__lt=until)
+    return attempts
+
+
+def attempt_records(attempts, chunk_size=CHUNK_SIZE):
+    """Yield each attempt with its answers, holding one chunk of attempts at a time."""
+    answer_keys = {}
+    for attempt in attempts.iterator(chunk_size=chunk_size):
+        if attempt.exam_id not in answer_keys:
+            answer_keys[attempt.exam_id] = get_answer_key(attempt.exam_id)
+        answer_key = answer_keys[attempt.exam_id]
+        record = {
+            'attempt_id': attempt.id,
+            'exam_id': attempt.exam_id,
+            'exam_title': attempt.exam.title,
+            'user_id': attempt.user_id,
+            'username': attempt.user.username,
+            'started_at': attempt.started_at,
+            'ends_at': attempt.ends_at,
+            'is_submitted': attempt.is_submitted,
+            'score': attempt.score,
+        }
+        answers = [
+            {
+                'question_id': question_id,
+                'choice_id': choice_id,
+                'is_correct': choice_id in answer_key.correct,
+            }
+            for question_id, choice_id in attempt.answer_map(answer_key).items()
+        ]
+        yield record, answers
+
+
+def render_csv(records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for record, answers in records:
+        attempt = [
+            record['attempt_id'], record['exam_id'], record['exam_title'], record['user_id'],
+            record['username'], record['started_at'].isoformat(), record['ends_at'].isoformat(),
+            record['is_submitted'], record['score'],
+        ]
+        if not answers:
+            yield writer.writerow(attempt + ['', '', ''])
+            continue
+        yield ''.join(
+            writer.writerow(attempt + [answer['question_id'], answer['choice_id'], answer['is_correct']])
+            for answer in answers
+        )
+
+
+def render_jsonl(records):
+    encoder = DjangoJSONEncoder()
+    for record, answers in records:
+        yield encoder.encode({**record, 'answers': answers}) + '\n'
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_attempts(file_format='csv', compress=False, chunk_size=CHUNK_SIZE, **filters):
+    """Return an iterator of encoded byte chunks for the attempts matching ``filters``."""
+    render = render_csv if file_format == 'csv' else render_jsonl
+    chunks = (text.encode() for text in render(attempt_records(export_queryset(**filters), chunk_size)))
+    return gzipped(chunks) if compress else chunks
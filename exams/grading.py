@@ -0,0 +1,154 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BinaryField, Case, F, PositiveIntegerField, Value, When
+
+from .attempt_state import invalidate_attempt_state
+from .caching import CACHE_TIMEOUT, cache_timeout, get_exam_version
+from .journal import flush_journal
+from .leaderboard import begin_scores, invalidate_leaderboard, record_scores
+from .models import Answer, Choice, ExamAttempt
+from .packing import pack_answers, unpack_ids
+from .pools import drawn_answers
+
+ANSWER_KEY_KEY = 'exams:answer_key:{exam_id}:{version}'
+
+
+class AnswerKey:
+    def __init__(self, rows):
+        self.choices = {}
+        correct = set()
+        for choice_id, question_id, is_correct in rows:
+            self.choices[choice_id] = question_id
+            if is_correct:
+                correct.add(choice_id)
+        self.correct = frozenset(correct)
+
+    def score(self, choice_ids):
+        return len(self.correct.intersection(choice_ids))
+
+
+def get_answer_key(exam_id):
+    key = ANSWER_KEY_KEY.format(exam_id=exam_id, version=get_exam_version(exam_id))
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = AnswerKey(
+            Choice.objects.filter(question__exam_id=exam_id)
+            .values_list('id', 'question_id', 'is_correct')
+        )
+        cache.set(key, answer_key, cache_timeout(CACHE_TIMEOUT))
+    return answer_key
+
+
+def invalid_answers(state, answers):
+    """Question ids in ``answers`` whose choice is wrong for them or that the attempt did not draw."""
+    choices = get_answer_key(state['exam_id']).choices
+    drawn = state.get('drawn')
+    return [
+        question_id for question_id, choice_id in answers.items()
+        if choices.get(choice_id) != question_id or (drawn is not None and question_id not in drawn)
+    ]
+
+
+def load_answers(attempt_ids):
+    answers = {attempt_id: {} for attempt_id in attempt_ids}
+    rows = Answer.objects.filter(attempt_id__in=attempt_ids).values_list(
+        'attempt_id', 'question_id', 'choice_id'
+    )
+    for attempt_id, question_id, choice_id in rows:
+        answers[attempt_id][question_id] = choice_id
+    return answers
+
+
+def compact_attempts(attempt_ids):
+    """Pack the Answer rows of already submitted attempts and delete the rows."""
+    with transaction.atomic():
+        answers = load_answers(attempt_ids)
+        ExamAttempt.objects.bulk_update(
+            [
+                ExamAttempt(id=attempt_id, packed_answers=pack_answers(attempt_answers))
+                for attempt_id, attempt_answers in answers.items()
+            ],
+            ['packed_answers'],
+        )
+        Answer.objects.filter(attempt_id__in=attempt_ids).delete()
+    return len(answers)
+
+
+def finalize_attempt(attempt):
+    flush_journal()
+    answer_key = get_answer_key(attempt.exam_id)
+    begin_scores(attempt.exam_id)
+    # A save landing between the read and the update would be deleted ungraded.
+    with transaction.atomic():
+        answers = drawn_answers(
+            attempt.drawn_question_ids, dict(attempt.answers.values_list('question_id', 'choice_id'))
+        )
+        score = answer_key.score(answers.values())
+        packed = pack_answers(answers)
+        finalized = ExamAttempt.objects.filter(id=attempt.id, is_submitted=False).update(
+            score=score, is_submitted=True, packed_answers=packed
+        )
+        if finalized:
+            Answer.objects.filter(attempt_id=attempt.id).delete()
+    if finalized:
+        attempt.score = score
+        attempt.is_submitted = True
+        attempt.packed_answers = packed
+        record_scores(attempt.exam_id, [(attempt.id, attempt.user_id, score)])
+    else:
+        attempt.refresh_from_db(fields=['score', 'is_submitted', 'packed_answers'])
+        record_scores(attempt.exam_id, [])
+    invalidate_attempt_state(attempt.id)
+    return bool(finalized)
+
+
+def finalize_attempts(attempt_ids):
+    flush_journal()
+    open_attempts = list(
+        ExamAttempt.objects.filter(id__in=attempt_ids, is_submitted=False)
+        .values_list('id', 'exam_id', 'user_id', 'drawn_questions')
+    )
+    if not open_attempts:
+        return 0
+    ids = [attempt_id for attempt_id, _, _, _ in open_attempts]
+    answer_keys = {exam_id: get_answer_key(exam_id) for _, exam_id, _, _ in open_attempts}
+    for exam_id in answer_keys:
+        begin_scores(exam_id)
+    with transaction.atomic():
+        answers = load_answers(ids)
+        for attempt_id, _, _, drawn in open_attempts:
+            if drawn is not None:
+                answers[attempt_id] = drawn_answers(unpack_ids(drawn), answers[attempt_id])
+        scores = {
+            attempt_id: answer_keys[exam_id].score(answers[attempt_id].values())
+            for attempt_id, exam_id, _, _ in open_attempts
+        }
+        finalized = ExamAttempt.objects.filter(id__in=ids, is_submitted=False).update(
+            is_submitted=True,
+            score=Case(
+                *[When(id=attempt_id, then=Value(score)) for attempt_id, score in scores.items()],
+                default=F('score'),
+                output_field=PositiveIntegerField(),
+            ),
+            packed_answers=Case(
+                *[When(id=attempt_id, then=Value(pack_answers(attempt_answers), output_field=BinaryField()))
+                  for attempt_id, attempt_answers in answers.items()],
+                default=F('packed_answers'),
+                output_field=BinaryField(),
+            ),
+        )
+        # Attempts lost to a concurrent finalize were packed by the winner before we got here.
+        Answer.objects.filter(attempt_id__in=ids).delete()
+    # Only now: a save before the commit would cache the state as still open again.
+    invalidate_attempt_state(*ids)
+
+    exams = {}
+    for attempt_id, exam_id, user_id, _ in open_attempts:
+        exams.setdefault(exam_id, []).append((attempt_id, user_id, scores[attempt_id]))
+    if finalized == len(open_attempts):
+        for exam_id, entries in exams.items():
+            record_scores(exam_id, entries)
+    else:
+        # Someone else finalized part of the batch in between; we can't tell which.
+        invalidate_leaderboard(*exams)
+    return finalized
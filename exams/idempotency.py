@@ -0,0 +1,109 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework import status
+
+IDEMPOTENCY_KEY = 'exams:idempotency:{user_id}:{path}:{key}'
+IDEMPOTENCY_TIMEOUT = 60 * 60 * 24
+IN_PROGRESS = 'in-progress'
+# A little over gunicorn's 30 s worker timeout: a marker left by a killed worker
+# must not block retries with the same key for the rest of the day.
+IN_PROGRESS_TIMEOUT = 60
+
+
+def idempotency_cache_key(request):
+    key = request.headers.get('Idempotency-Key')
+    if request.method != 'POST' or not key or not request.user.is_authenticated:
+        return None
+    return IDEMPOTENCY_KEY.format(user_id=request.user.id, path=request.path, key=key)
+
+
+def claim(cache_key):
+    """Mark the request as in progress; returns the response to send instead if it was seen before."""
+    if cache.add(cache_key, IN_PROGRESS, IN_PROGRESS_TIMEOUT):
+        return None
+    stored = cache.get(cache_key)
+    if stored == IN_PROGRESS:
+        return HttpResponse(
+            b'{"error":"A request with this Idempotency-Key is still in progress."}',
+            status=status.HTTP_409_CONFLICT,
+            content_type='application/json',
+        )
+    if stored is not None:
+        status_code, content_type, content = stored
+        response = HttpResponse(content, status=status_code, content_type=content_type)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+    return None
+
+
+def store(cache_key, response):
+    # Only successes are replayed: a retry after a refusal or a failure runs again.
+    if 200 <= response.status_code < 300:
+        cache.set(
+            cache_key,
+            (response.status_code, response['Content-Type'], response.content),
+            IDEMPOTENCY_TIMEOUT,
+        )
+    else:
+        cache.delete(cache_key)
+
+
+class Replay(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class IdempotentMixin:
+    claimed_key = None
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication, the CSRF check and throttling come first: refused requests claim nothing.
+        super().initial(request, *args, **kwargs)
+        cache_key = idempotency_cache_key(request)
+        if cache_key is not None:
+            replay = claim(cache_key)
+            if replay is not None:
+                raise Replay(replay)
+            self.claimed_key = cache_key
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Replay):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            if self.claimed_key is not None and hasattr(response, 'render'):
+                response.render()
+        except Exception:
+            if self.claimed_key is not None:
+                cache.delete(self.claimed_key)
+            raise
+        if self.claimed_key is not None:
+            store(self.claimed_key, response)
+        return response
+
+
+def idempotent(view):
+    """IdempotentMixin for the async views; goes inside ``authenticated``."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        cache_key = idempotency_cache_key(request)
+        if cache_key is None:
+            return await view(request, *args, **kwargs)
+        replay = await sync_to_async(claim)(cache_key)
+        if replay is not None:
+            return replay
+
+        try:
+            response = await view(request, *args, **kwargs)
+        except Exception:
+            await cache.adelete(cache_key)
+            raise
+        await sync_to_async(store)(cache_key, response)
+        return response
+    return wrapper
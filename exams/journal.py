@@ -0,0 +1,207 @@
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import Answer, ExamAttempt
+
+logger = logging.getLogger(__name__)
+
+STAT_NAMES = ['appended', 'flushes', 'flushed', 'last_flush_ms', 'max_flush_ms']
+
+
+def upsert_answers(rows, batch_size=None):
+    Answer.objects.bulk_create(
+        [
+            Answer(attempt_id=attempt_id, question_id=question_id, choice_id=choice_id)
+            for attempt_id, question_id, choice_id in rows
+        ],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['attempt', 'question'],
+        update_fields=['choice'],
+    )
+
+
+def upsert_open_answers(rows, batch_size=None):
+    """Upsert ``(attempt_id, question_id, choice_id)`` rows of attempts that are still open.
+
+    Returns the ids of the attempts written. Answers for attempts deleted or finalized
+    meanwhile, possibly by another worker whose cached state says otherwise, are dropped.
+    """
+    rows = list(rows)
+    with transaction.atomic():
+        live = set(
+            ExamAttempt.objects.filter(id__in={row[0] for row in rows}, is_submitted=False)
+            .values_list('id', flat=True)
+        )
+        upsert_answers([row for row in rows if row[0] in live], batch_size=batch_size)
+    return live
+
+
+class AnswerJournal:
+    def __init__(self, path, interval=2, batch_size=500):
+        self.path = str(path)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.worker_lock = threading.Lock()
+        self.worker = None
+        # Appended since this process last added them to the shared counters.
+        self.appended = 0
+        self.appended_lock = threading.Lock()
+
+    def append(self, attempt_id, answers):
+        lines = ''.join(
+            json.dumps([attempt_id, question_id, choice_id]) + '\n'
+            for question_id, choice_id in answers.items()
+        )
+        while True:
+            with open(self.path, 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                # The flusher may have rotated the file while we waited for the lock.
+                if self.is_current(f):
+                    f.write(lines)
+                    break
+        with self.appended_lock:
+            self.appended += len(answers)
+        self.start_worker()
+
+    def is_current(self, f):
+        try:
+            return os.path.samestat(os.fstat(f.fileno()), os.stat(self.path))
+        except FileNotFoundError:
+            return False
+
+    def depth(self):
+        depth = 0
+        for path in [self.path, *self.pending()]:
+            try:
+                with open(path, 'rb') as f:
+                    depth += sum(1 for _ in f)
+            except FileNotFoundError:
+                pass
+        return depth
+
+    def pending(self):
+        return sorted(glob.glob(f'{glob.escape(self.path)}.*.flushing'))
+
+    def overlay(self, attempt_id, load_saved):
+        """Apply ``attempt_id``'s journaled answers on top of the saved ones ``load_saved()`` reads.
+
+        Holding the flush lock keeps lines from moving into the table between the two reads.
+        """
+        prefix = f'[{attempt_id}, '
+        with self.lock, open(f'{self.path}.lock', 'a') as flush_lock:
+            fcntl.flock(flush_lock, fcntl.LOCK_EX)
+            answers = load_saved()
+            for path in [*self.pending(), self.path]:
+                try:
+                    with open(path) as f:
+                        fcntl.flock(f, fcntl.LOCK_SH)
+                        for line in f:
+                            if line.startswith(prefix):
+                                _, question_id, choice_id = json.loads(line)
+                                answers[question_id] = choice_id
+                except FileNotFoundError:
+                    pass
+        return answers
+
+    def rotate(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            os.replace(self.path, f'{self.path}.{time.time_ns()}.flushing')
+
+    def flush(self):
+        started = time.monotonic()
+        flushed = 0
+        with self.lock, open(f'{self.path}.lock', 'a') as flush_lock:
+            fcntl.flock(flush_lock, fcntl.LOCK_EX)
+            self.rotate()
+            for path in self.pending():
+                answers = {}
+                with open(path) as f:
+                    for line in f:
+                        attempt_id, question_id, choice_id = json.loads(line)
+                        answers[attempt_id, question_id] = choice_id
+                upsert_open_answers(
+                    [(attempt_id, question_id, choice_id)
+                     for (attempt_id, question_id), choice_id in answers.items()],
+                    batch_size=self.batch_size,
+                )
+                os.remove(path)
+                flushed += len(answers)
+            # Still under the flush lock, which also guards the shared counters.
+            self.update_stats(flushed, (time.monotonic() - started) * 1000)
+        return flushed
+
+    def read_stats(self):
+        stats = dict.fromkeys(STAT_NAMES, 0)
+        try:
+            with open(f'{self.path}.stats') as f:
+                stats.update(json.load(f))
+        except (FileNotFoundError, ValueError):
+            pass
+        return stats
+
+    def update_stats(self, flushed, elapsed_ms):
+        with self.appended_lock:
+            appended, self.appended = self.appended, 0
+        if not appended and not flushed:
+            return
+        stats = self.read_stats()
+        stats['appended'] += appended
+        if flushed:
+            stats['flushes'] += 1
+            stats['flushed'] += flushed
+            stats['last_flush_ms'] = elapsed_ms
+            stats['max_flush_ms'] = max(stats['max_flush_ms'], elapsed_ms)
+        with open(f'{self.path}.stats.tmp', 'w') as f:
+            json.dump(stats, f)
+        os.replace(f'{self.path}.stats.tmp', f'{self.path}.stats')
+
+    def start_worker(self):
+        if self.worker is None or not self.worker.is_alive():
+            with self.worker_lock:
+                if self.worker is None or not self.worker.is_alive():
+                    self.worker = threading.Thread(target=self.run, name='answer-journal', daemon=True)
+                    self.worker.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush the answer journal.')
+            finally:
+                close_old_connections()
+
+    def get_stats(self):
+        """Counters of every process sharing this journal; others' appends count from their last flush."""
+        stats = self.read_stats()
+        stats['appended'] += self.appended
+        return {'depth': self.depth(), **stats}
+
+
+journal = AnswerJournal(
+    settings.ANSWER_JOURNAL_PATH,
+    interval=settings.ANSWER_JOURNAL_FLUSH_INTERVAL,
+)
+
+
+def write_behind_enabled():
+    return settings.ANSWER_WRITE_BEHIND
+
+
+def flush_journal():
+    if write_behind_enabled():
+        journal.flush()
@@ -0,0 +1,143 @@
+import bisect
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count
+
+from .caching import CACHE_TIMEOUT
+from .models import ExamAttempt
+
+LEADERBOARD_KEY = 'exams:leaderboard:{exam_id}'
+LEADERBOARD_GENERATION_KEY = 'exams:leaderboard_generation:{exam_id}'
+LEADERBOARD_SIZE = 10
+
+
+class Leaderboard:
+    """Score-bucket counts plus a bounded, sorted top list for one exam."""
+
+    def __init__(self, size=LEADERBOARD_SIZE, generation=0):
+        self.size = size
+        self.generation = generation
+        self.counts = []
+        self.total = 0
+        self.top = []
+
+    def add(self, attempt_id, user_id, score):
+        if score >= len(self.counts):
+            self.counts.extend([0] * (score + 1 - len(self.counts)))
+        self.counts[score] += 1
+        self.total += 1
+        entry = (-score, attempt_id, user_id)
+        if len(self.top) < self.size or entry < self.top[-1]:
+            bisect.insort(self.top, entry)
+            del self.top[self.size:]
+
+    def ranking(self, score):
+        above = sum(self.counts[score + 1:])
+        tied = self.counts[score] if score < len(self.counts) else 0
+        return {
+            'rank': above + 1,
+            'total': self.total,
+            'percentile': round(100 * (self.total - above - tied + tied / 2) / self.total, 2)
+            if self.total else None,
+        }
+
+
+# Writers bump the exam's generation twice: before committing scores and once they are
+# committed. A board is tagged with the generation it was built or last updated at, and
+# any writer that sees the generation move under it drops the board instead of caching
+# something that may miss, or count twice, a score committed meanwhile.
+#
+# The generation only works if every process bumps the same counter, so boards are only
+# cached in a shared cache; otherwise each read rebuilds the board from the table.
+
+def get_generation(exam_id):
+    return cache.get(LEADERBOARD_GENERATION_KEY.format(exam_id=exam_id), 0)
+
+
+def bump_generation(exam_id):
+    key = LEADERBOARD_GENERATION_KEY.format(exam_id=exam_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        return cache.incr(key)
+
+
+def store_leaderboard(exam_id, leaderboard):
+    if not settings.SHARED_CACHE:
+        return
+    key = LEADERBOARD_KEY.format(exam_id=exam_id)
+    cache.set(key, leaderboard, CACHE_TIMEOUT)
+    if get_generation(exam_id) != leaderboard.generation:
+        cache.delete(key)
+
+
+def build_leaderboard(exam_id):
+    leaderboard = Leaderboard(generation=get_generation(exam_id))
+    submitted = ExamAttempt.objects.filter(exam_id=exam_id, is_submitted=True)
+    for score, count in submitted.values('score').annotate(count=Count('id')).values_list('score', 'count'):
+        if score >= len(leaderboard.counts):
+            leaderboard.counts.extend([0] * (score + 1 - len(leaderboard.counts)))
+        leaderboard.counts[score] = count
+        leaderboard.total += count
+    leaderboard.top = [
+        (-score, attempt_id, user_id)
+        for attempt_id, user_id, score in submitted.order_by('-score', 'id')
+        .values_list('id', 'user_id', 'score')[:leaderboard.size]
+    ]
+    store_leaderboard(exam_id, leaderboard)
+    return leaderboard
+
+
+def get_leaderboard(exam_id):
+    leaderboard = cache.get(LEADERBOARD_KEY.format(exam_id=exam_id)) if settings.SHARED_CACHE else None
+    if leaderboard is None:
+        leaderboard = build_leaderboard(exam_id)
+    return leaderboard
+
+
+def begin_scores(exam_id):
+    """Call before committing finalized scores for ``exam_id``, then ``record_scores`` after."""
+    bump_generation(exam_id)
+
+
+def record_scores(exam_id, entries):
+    """Add (attempt_id, user_id, score) entries for newly finalized attempts."""
+    generation = bump_generation(exam_id)
+    key = LEADERBOARD_KEY.format(exam_id=exam_id)
+    leaderboard = cache.get(key)
+    if leaderboard is None:
+        # The next reader rebuilds from the table, which already includes these attempts.
+        return
+    if leaderboard.generation != generation - 2:
+        # Another writer got in since our begin_scores, or the board was built while
+        # these scores were being committed and may already count them.
+        cache.delete(key)
+        return
+    for attempt_id, user_id, score in entries:
+        leaderboard.add(attempt_id, user_id, score)
+    leaderboard.generation = generation
+    store_leaderboard(exam_id, leaderboard)
+
+
+def invalidate_leaderboard(*exam_ids):
+    for exam_id in exam_ids:
+        bump_generation(exam_id)
+    cache.delete_many([LEADERBOARD_KEY.format(exam_id=exam_id) for exam_id in exam_ids])
+
+
+def get_ranking(attempt):
+    leaderboard = get_leaderboard(attempt.exam_id)
+    usernames = dict(
+        User.objects.filter(id__in={user_id for _, _, user_id in leaderboard.top})
+        .values_list('id', 'username')
+    )
+    return {
+        **leaderboard.ranking(attempt.score),
+        'leaderboard': [
+            {'rank': leaderboard.ranking(-score)['rank'], 'username': usernames.get(user_id), 'score': -score}
+            for score, _, user_id in leaderboard.top
+        ],
+    }
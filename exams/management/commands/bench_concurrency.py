@@ -0,0 +1,90 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncClient, Client
+
+from exams.benchmark import answer_plan, seed_candidates, seed_exam, summarize, throwaway_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare how many concurrent candidates one process serves through the WSGI '
+        'views and the async ASGI views. Runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=50)
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--answers', type=int, default=10, help='Answers saved per candidate.')
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='WSGI request threads; 1 matches a default gunicorn sync worker.'
+        )
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            for label, run in [('wsgi', self.run_wsgi), ('asgi', self.run_asgi)]:
+                exam = seed_exam(title=f'{label} exam', questions=options['questions'])
+                users = seed_candidates(options['candidates'], prefix=f'{label}-candidate')
+                plan = answer_plan(exam, options['answers'])
+                started = time.perf_counter()
+                latencies = run(exam, users, plan, options)
+                elapsed = time.perf_counter() - started
+                stats = summarize(latencies, elapsed)
+                self.stdout.write(
+                    f"{label}: {len(users)} candidates in {elapsed:.2f}s "
+                    f"({len(users) / elapsed:.1f} candidates/s, {stats['throughput']:.0f} req/s, "
+                    f"p50 {stats['p50_ms']:.1f}ms, p95 {stats['p95_ms']:.1f}ms, "
+                    f"p99 {stats['p99_ms']:.1f}ms)"
+                )
+
+    def run_wsgi(self, exam, users, plan, options):
+        def candidate(user):
+            client = Client()
+            client.force_login(user)
+            latencies = []
+
+            def timed(path, data=None):
+                started = time.perf_counter()
+                response = client.post(path, data, content_type='application/json')
+                latencies.append(time.perf_counter() - started)
+                return response
+
+            try:
+                attempt_id = timed(f'/api/exams/{exam.id}/start/').json()['attempt_id']
+                for answer in plan:
+                    timed('/api/exams/save-answer/', {'attempt_id': attempt_id, **answer})
+                timed(f'/api/exams/{exam.id}/submit/')
+            finally:
+                close_old_connections()
+            return latencies
+
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            return [latency for result in executor.map(candidate, users) for latency in result]
+
+    def run_asgi(self, exam, users, plan, options):
+        async def candidate(user):
+            client = AsyncClient()
+            await client.aforce_login(user)
+            latencies = []
+
+            async def timed(path, data=None):
+                started = time.perf_counter()
+                response = await client.post(path, data, content_type='application/json')
+                latencies.append(time.perf_counter() - started)
+                return response
+
+            attempt_id = (await timed(f'/api/exams/async/{exam.id}/start/')).json()['attempt_id']
+            for answer in plan:
+                await timed('/api/exams/async/save-answer/', {'attempt_id': attempt_id, **answer})
+            await timed(f'/api/exams/async/{exam.id}/submit/')
+            return latencies
+
+        async def run():
+            results = await asyncio.gather(*(candidate(user) for user in users))
+            return [latency for result in results for latency in result]
+
+        return asyncio.run(run())
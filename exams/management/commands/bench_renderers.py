@@ -0,0 +1,68 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from config.renderers import FastJSONRenderer, MessagePackRenderer
+from exams.benchmark import encoding_overhead, seed_catalog, throwaway_database
+from exams.models import Exam
+from exams.serializers import ExamDetailSerializer, ExamSerializer
+
+RENDERERS = {
+    'drf-json': JSONRenderer(),
+    'orjson': FastJSONRenderer(),
+    'msgpack': MessagePackRenderer(),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare bytes on the wire and encode time of the exam paper, exam list and resume '
+        'payloads under each renderer, raw and gzipped. Runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exams', type=int, default=20)
+        parser.add_argument('--questions', type=int, default=100, help='Questions on the exam paper.')
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--rounds', type=int, default=200, help='Encodes per payload and renderer.')
+        parser.add_argument('--output', help='Write the report to this JSON file.')
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            exam = seed_catalog(
+                exams=options['exams'], questions=options['questions'], choices=options['choices']
+            )[0]
+            paper = Exam.objects.select_related('course').prefetch_related('questions__choices').get(id=exam.id)
+            payloads = {
+                'paper': ExamDetailSerializer(paper).data,
+                'list': ExamSerializer(Exam.objects.select_related('course'), many=True).data,
+                'resume': {
+                    'attempt_id': 1,
+                    'ends_at': timezone.now() + timedelta(minutes=exam.duration),
+                    'saved_answers': {
+                        str(question.id): question.choices.all()[0].id for question in paper.questions.all()
+                    },
+                    'message': 'Resuming existing attempt.',
+                },
+            }
+            report = encoding_overhead(payloads, RENDERERS, options['rounds'])
+
+        self.stdout.write(
+            f"{'payload':<8} {'renderer':<9} {'bytes':>8} {'gzip':>7} {'encode us':>10} {'gzip us':>8}"
+        )
+        for payload, results in report.items():
+            for name, stats in results.items():
+                self.stdout.write(
+                    f"{payload:<8} {name:<9} {stats['bytes']:>8} {stats['gzip_bytes']:>7} "
+                    f"{stats['encode_us']:>10.1f} {stats['gzip_us']:>8.1f}"
+                )
+        for payload, results in report.items():
+            speedup = results['drf-json']['encode_us'] / results['orjson']['encode_us']
+            self.stdout.write(f'{payload}: orjson encodes {speedup:.1f}x faster than the DRF renderer.')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
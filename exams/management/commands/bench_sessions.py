@@ -0,0 +1,50 @@
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from exams.benchmark import seed_candidates, seed_catalog, session_overhead, throwaway_database
+
+ENGINES = [
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+    'django.contrib.sessions.backends.cache',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the session and auth queries each authenticated request costs under the '
+        'db, cached_db and cache session engines. Runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per session engine.')
+        parser.add_argument('--output', help='Write the report to this JSON file.')
+
+    def handle(self, *args, **options):
+        report = {}
+        with throwaway_database():
+            seed_catalog(courses=1, exams=2, questions=5, choices=3)
+            user = seed_candidates(1, prefix='session-bench')[0]
+            for engine in ENGINES:
+                cache.clear()
+                report[engine.rsplit('.', 1)[1]] = session_overhead(engine, user, options['requests'])
+
+        self.stdout.write(
+            f"{'engine':<10} {'session q':>9} {'user q':>7} {'other q':>8} {'p50 ms':>7} {'p95 ms':>7}"
+        )
+        for engine, stats in report.items():
+            self.stdout.write(
+                f"{engine:<10} {stats['session_queries']:>9.2f} {stats['user_queries']:>7.2f} "
+                f"{stats['other_queries']:>8.2f} {stats['p50_ms']:>7.2f} {stats['p95_ms']:>7.2f}"
+            )
+        baseline = report['db']
+        for engine, stats in report.items():
+            saved = baseline['session_queries'] - stats['session_queries']
+            if engine != 'db':
+                self.stdout.write(f'{engine} saves {saved:.2f} session queries per request over db.')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from exams.grading import compact_attempts
+from exams.models import ExamAttempt
+
+
+class Command(BaseCommand):
+    help = (
+        'Pack the Answer rows of attempts submitted before packing existed into '
+        'ExamAttempt.packed_answers, then delete the rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Attempts packed per transaction.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = 0
+        last_id = 0
+        while True:
+            attempt_ids = list(
+                ExamAttempt.objects.filter(is_submitted=True, packed_answers__isnull=True, id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:options['chunk_size']]
+            )
+            if not attempt_ids:
+                break
+            total += compact_attempts(attempt_ids)
+            last_id = attempt_ids[-1]
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Packed {total} attempts...')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Packed {total} attempts in {elapsed:.2f}s '
+            f'({total / elapsed if elapsed else 0:.0f} attempts/s).'
+        )
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from exams.grading import finalize_attempts
+from exams.models import ExamAttempt
+
+
+class Command(BaseCommand):
+    help = 'Auto-submit exam attempts whose time has run out.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep sweeping every --interval seconds instead of running once.'
+        )
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between sweeps.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Attempts graded per update.')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        while True:
+            self.sweep(options['chunk_size'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def sweep(self, chunk_size):
+        started = time.monotonic()
+        now = timezone.now()
+        total = 0
+        while True:
+            attempt_ids = list(
+                ExamAttempt.objects.filter(is_submitted=False, ends_at__lt=now)
+                .order_by()
+                .values_list('id', flat=True)[:chunk_size]
+            )
+            if not attempt_ids:
+                break
+            total += finalize_attempts(attempt_ids)
+
+        elapsed = time.monotonic() - started
+        if total or self.verbosity > 1:
+            self.stdout.write(
+                f'Auto-submitted {total} attempts in {elapsed:.2f}s '
+                f'({total / elapsed if elapsed else 0:.0f} attempts/s).'
+            )
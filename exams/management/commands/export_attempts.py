@@ -0,0 +1,35 @@
+import sys
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.export import CHUNK_SIZE, FORMATS, export_attempts, parse_bound
+
+
+class Command(BaseCommand):
+    help = 'Stream attempts and their answers to CSV or JSONL, optionally gzipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exam', type=int, help='Only attempts for this exam.')
+        parser.add_argument('--since', help='Only attempts started at or after this ISO date/datetime.')
+        parser.add_argument('--until', help='Only attempts started before this ISO date/datetime.')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Attempts fetched per query.')
+        parser.add_argument('--output', help='Write to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_bound(options['since'])
+            until = parse_bound(options['until'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        chunks = export_attempts(
+            options['format'], options['gzip'], options['chunk_size'],
+            exam_id=options['exam'], since=since, until=until,
+        )
+        output = open(options['output'], 'wb') if options['output'] else nullcontext(sys.stdout.buffer)
+        with output as f:
+            for chunk in chunks:
+                f.write(chunk)
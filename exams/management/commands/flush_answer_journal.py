@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from exams.journal import journal
+
+
+class Command(BaseCommand):
+    help = (
+        'Flush the write-behind answer journal to the Answer table and print the counters '
+        'of every process sharing it.'
+    )
+
+    def handle(self, *args, **options):
+        flushed = journal.flush()
+        self.stdout.write(f'Flushed {flushed} answers.')
+        for name, value in journal.get_stats().items():
+            self.stdout.write(f'{name}: {value}')
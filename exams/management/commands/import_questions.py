@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.question_bank import CHUNK_SIZE, FORMATS, guess_format, import_questions, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a JSONL or CSV question bank into Question and Choice rows in chunks, '
+        'reporting throughput and rejected rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Question bank file, or '-' for stdin.")
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--exam', type=int, help='Exam for rows that do not name one.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Questions per transaction.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(e)
+
+        with stream:
+            report = import_questions(
+                read_rows(stream, file_format, options['exam']), chunk_size=options['chunk_size']
+            )
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        if report['failed'] > len(report['errors']):
+            self.stderr.write(f"... and {report['failed'] - len(report['errors'])} more rejected rows.")
+        self.stdout.write(
+            f"Imported {report['imported']} of {report['rows']} questions into "
+            f"{len(report['exam_ids'])} exams in {report['elapsed']:.2f}s "
+            f"({report['rows_per_second'] or 0:.0f} rows/s)."
+        )
+        if report['error']:
+            raise CommandError(report['error'])
@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.benchmark import compare, seed_catalog, simulate, throwaway_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and drive simulated candidates through the full exam '
+        'lifecycle, reporting latency percentiles, throughput and SQL queries per endpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=2)
+        parser.add_argument('--exams', type=int, default=2, help='Exams per course.')
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--candidates', type=int, default=50)
+        parser.add_argument('--saves', type=int, default=20, help='Answers saved per candidate.')
+        parser.add_argument('--output', help='Write the report to this JSON file.')
+        parser.add_argument('--baseline', help='Compare against a previously written JSON report.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Allowed p95 slowdown against the baseline, as a fraction.'
+        )
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            exams = seed_catalog(
+                courses=options['courses'], exams=options['exams'],
+                questions=options['questions'], choices=options['choices'],
+            )
+            report = simulate(exams, options['candidates'], options['saves'])
+
+        self.stdout.write(
+            f"{'endpoint':<12} {'requests':>8} {'req/s':>8} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8} {'queries':>8}"
+        )
+        for endpoint, stats in report.items():
+            self.stdout.write(
+                f"{endpoint:<12} {stats['requests']:>8} {stats['throughput']:>8.1f} "
+                f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} "
+                f"{stats['queries_mean']:>8.1f}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'options': {
+                    key: options[key]
+                    for key in ['courses', 'exams', 'questions', 'choices', 'candidates', 'saves']
+                }, 'endpoints': report}, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}.")
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['endpoints']
+            regressions = compare(report, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against baseline:\n' + '\n'.join(regressions))
+            self.stdout.write('No regressions against baseline.')
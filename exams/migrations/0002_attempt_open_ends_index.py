@@ -0,0 +1,19 @@
+# Generated by Django 6.0.3 on 2026-10-18 04:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='examattempt',
+            index=models.Index(condition=models.Q(('is_submitted', False)), fields=['ends_at'], name='exams_attempt_open_ends_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.3 on 2026-10-18 04:37
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_question_counts(apps, schema_editor):
+    Exam = apps.get_model('exams', 'Exam')
+    Question = apps.get_model('exams', 'Question')
+    counts = (
+        Question.objects.filter(exam=OuterRef('pk'))
+        .order_by()
+        .values('exam')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    Exam.objects.update(question_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0002_attempt_open_ends_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_question_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.3 on 2026-10-18 04:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def close_duplicate_open_attempts(apps, schema_editor):
+    ExamAttempt = apps.get_model('exams', 'ExamAttempt')
+    Answer = apps.get_model('exams', 'Answer')
+    duplicates = (
+        ExamAttempt.objects.filter(is_submitted=False)
+        .values('user', 'exam')
+        .annotate(open_count=Count('id'))
+        .filter(open_count__gt=1)
+    )
+    for group in duplicates:
+        stale = (
+            ExamAttempt.objects.filter(user=group['user'], exam=group['exam'], is_submitted=False)
+            .order_by('-started_at', '-id')[1:]
+        )
+        for attempt in stale:
+            attempt.score = Answer.objects.filter(attempt=attempt, choice__is_correct=True).count()
+            attempt.is_submitted = True
+            attempt.save(update_fields=['score', 'is_submitted'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0003_exam_question_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_open_attempts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='examattempt',
+            index=models.Index(fields=['user', 'exam', '-started_at'], name='exams_attempt_user_exam_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='examattempt',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_submitted', False)), fields=('user', 'exam'), name='exams_attempt_one_open'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-18 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0004_attempt_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examattempt',
+            name='packed_answers',
+            field=models.BinaryField(null=True),
+        ),
+    ]
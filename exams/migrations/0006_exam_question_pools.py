@@ -0,0 +1,23 @@
+# Generated by Django 6.0.3 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0005_attempt_packed_answers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='questions_per_attempt',
+            field=models.PositiveIntegerField(default=0, help_text='Questions drawn at random for each attempt; 0 = the full paper, in order'),
+        ),
+        migrations.AddField(
+            model_name='examattempt',
+            name='seed',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.3 on 2026-10-18 10:40
+
+import random
+
+from django.db import migrations, models
+
+from exams.packing import pack_ids
+
+
+def store_draws(apps, schema_editor):
+    """Replay each pooled attempt's seed against the bank as it stands, as the draw used to."""
+    ExamAttempt = apps.get_model('exams', 'ExamAttempt')
+    Question = apps.get_model('exams', 'Question')
+    banks = {}
+    attempts = ExamAttempt.objects.filter(seed__isnull=False).select_related('exam').order_by('id')
+    for attempt in attempts.iterator():
+        if attempt.exam_id not in banks:
+            banks[attempt.exam_id] = list(
+                Question.objects.filter(exam_id=attempt.exam_id).order_by('id').values_list('id', flat=True)
+            )
+        bank = banks[attempt.exam_id]
+        size = min(attempt.exam.questions_per_attempt or len(bank), len(bank))
+        indices = random.Random(attempt.seed).sample(range(len(bank)), size)
+        attempt.drawn_questions = pack_ids(bank[index] for index in indices)
+        attempt.save(update_fields=['drawn_questions'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0006_exam_question_pools'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examattempt',
+            name='drawn_questions',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.RunPython(store_draws, migrations.RunPython.noop),
+    ]
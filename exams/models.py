@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
+from .packing import unpack_ids
+
 
 class Course(models.Model):
     title = models.CharField(max_length=200)
@@ -20,10 +24,27 @@ class Exam(models.Model):
     max_attempts = models.PositiveIntegerField(
         default=1, help_text="0 = unlimited"
     )
+    question_count = models.PositiveIntegerField(default=0, editable=False)
+    questions_per_attempt = models.PositiveIntegerField(
+        default=0, help_text="Questions drawn at random for each attempt; 0 = the full paper, in order"
+    )
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
+    @classmethod
+    def update_question_counts(cls, exam_ids):
+        counts = (
+            Question.objects.filter(exam=OuterRef('pk'))
+            .order_by()
+            .values('exam')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        cls.objects.filter(id__in=exam_ids).update(
+            question_count=Coalesce(Subquery(counts), 0)
+        )
+
 
 class Question(models.Model):
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='questions')
@@ -49,13 +70,62 @@ class ExamAttempt(models.Model):
     ends_at = models.DateTimeField()
     is_submitted = models.BooleanField(default=False)
     score = models.PositiveIntegerField(default=0)
+    # Finalized attempts keep their answers here instead of as Answer rows.
+    packed_answers = models.BinaryField(null=True)
+    # The question ids drawn for this attempt, packed in the order it was dealt them, and
+    # the seed that shuffles their choices; both null when it sits the full paper.
+    drawn_questions = models.BinaryField(null=True, editable=False)
+    seed = models.PositiveBigIntegerField(null=True, editable=False)
 
     class Meta:
         ordering = ['-started_at']
+        indexes = [
+            models.Index(
+                fields=['ends_at'],
+                condition=models.Q(is_submitted=False),
+                name='exams_attempt_open_ends_idx',
+            ),
+            models.Index(fields=['user', 'exam', '-started_at'], name='exams_attempt_user_exam_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'exam'],
+                condition=models.Q(is_submitted=False),
+                name='exams_attempt_one_open',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.exam.title}"
 
+    @property
+    def drawn_question_ids(self):
+        """The questions this attempt was given, or ``None`` if it sits the full paper."""
+        if self.drawn_questions is None:
+            return None
+        return unpack_ids(self.drawn_questions)
+
+    @property
+    def total_questions(self):
+        if self.drawn_questions is not None:
+            return len(self.drawn_question_ids)
+        return self.exam.question_count
+
+    def answer_map(self, answer_key=None):
+        """Return ``{question_id: choice_id}`` whether the answers are packed or still rows."""
+        if self.packed_answers is None:
+            if 'answers' in getattr(self, '_prefetched_objects_cache', {}):
+                return {answer.question_id: answer.choice_id for answer in self.answers.all()}
+            return dict(self.answers.values_list('question_id', 'choice_id'))
+        if answer_key is None:
+            from .grading import get_answer_key
+            answer_key = get_answer_key(self.exam_id)
+        return {
+            answer_key.choices[choice_id]: choice_id
+            for choice_id in unpack_ids(self.packed_answers)
+            if choice_id in answer_key.choices
+        }
+
 
 class Answer(models.Model):
     attempt = models.ForeignKey(ExamAttempt, on_delete=models.CASCADE, related_name='answers')
@@ -0,0 +1,27 @@
+import sys
+from array import array
+
+# Ids as little-endian signed 64-bit integers. Answers are stored as their choice ids,
+# ordered by question id.
+TYPECODE = 'q'
+
+
+def pack_ids(ids):
+    """Pack a sequence of ids into bytes, keeping their order."""
+    values = array(TYPECODE, ids)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def pack_answers(answers):
+    """Pack a ``{question_id: choice_id}`` map into bytes."""
+    return pack_ids(answers[question_id] for question_id in sorted(answers))
+
+
+def unpack_ids(data):
+    values = array(TYPECODE)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tolist()
@@ -0,0 +1,90 @@
+import random
+import secrets
+
+from django.core.cache import cache
+from django.http import Http404
+
+from .caching import CACHE_TIMEOUT, cache_timeout, get_exam_version
+from .models import Exam
+from .packing import pack_ids
+
+QUESTION_POOL_KEY = 'exams:pool:{exam_id}:{version}'
+SEED_BITS = 63
+
+
+def new_seed():
+    return secrets.randbits(SEED_BITS)
+
+
+class QuestionPool:
+    """The whole question bank of an exam, from which each attempt draws its paper.
+
+    An attempt keeps the ids it drew and its seed: the paper is rebuilt from them
+    whenever it is needed, with the choices of each question shuffled by the seed.
+    """
+
+    def __init__(self, exam, questions):
+        self.exam = {
+            'id': exam.id,
+            'title': exam.title,
+            'course_title': exam.course.title,
+            'duration': exam.duration,
+            'total_marks': exam.total_marks,
+            'max_attempts': exam.max_attempts,
+            'questions_per_attempt': exam.questions_per_attempt,
+        }
+        self.size = exam.questions_per_attempt
+        self.questions = tuple(
+            (question.id, question.text, tuple((choice.id, choice.text) for choice in question.choices.all()))
+            for question in questions
+        )
+
+    def question_ids(self, seed):
+        count = len(self.questions)
+        indices = random.Random(seed).sample(range(count), min(self.size or count, count))
+        return [self.questions[index][0] for index in indices]
+
+    def paper(self, seed, question_ids):
+        rng = random.Random(seed)
+        bank = {question_id: (text, choices) for question_id, text, choices in self.questions}
+        questions = []
+        # Questions deleted since the draw drop out; nothing takes their place.
+        for question_id in question_ids:
+            if question_id not in bank:
+                continue
+            text, choices = bank[question_id]
+            questions.append({
+                'id': question_id,
+                'text': text,
+                'choices': [
+                    {'id': choice_id, 'text': choice_text}
+                    for choice_id, choice_text in rng.sample(choices, len(choices))
+                ],
+            })
+        return {**self.exam, 'questions': questions}
+
+
+def get_question_pool(exam_id):
+    key = QUESTION_POOL_KEY.format(exam_id=exam_id, version=get_exam_version(exam_id))
+    pool = cache.get(key)
+    if pool is None:
+        exam = Exam.objects.filter(id=exam_id).select_related('course').first()
+        if exam is None:
+            raise Http404
+        pool = QuestionPool(exam, exam.questions.prefetch_related('choices').order_by('id'))
+        cache.set(key, pool, cache_timeout(CACHE_TIMEOUT))
+    return pool
+
+
+def draw_questions(exam_id):
+    """A seed and the question ids it draws from the bank as it stands, packed for the attempt."""
+    seed = new_seed()
+    return seed, pack_ids(get_question_pool(exam_id).question_ids(seed))
+
+
+def drawn_answers(drawn, answers):
+    """Drop answers to questions outside ``drawn``; ``None`` means the full paper."""
+    if drawn is None:
+        return answers
+    drawn = set(drawn)
+    return {question_id: choice_id for question_id, choice_id in answers.items() if question_id in drawn}
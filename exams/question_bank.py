@@ -0,0 +1,163 @@
+import csv
+import json
+import time
+
+from django.db import transaction
+
+from .caching import bump_exam_list_version, bump_exam_version
+from .models import Choice, Exam, Question
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+FORMATS = ('jsonl', 'csv')
+
+CHOICE_TEXT_LENGTH = Choice._meta.get_field('text').max_length
+
+
+def guess_format(filename):
+    return 'csv' if filename.lower().endswith('.csv') else 'jsonl'
+
+
+def read_rows(lines, file_format, exam_id=None):
+    reader = read_csv if file_format == 'csv' else read_jsonl
+    return reader(lines, exam_id)
+
+
+def read_jsonl(lines, exam_id=None):
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        if isinstance(row, dict):
+            row.setdefault('exam_id', exam_id)
+        yield line_number, row
+
+
+def read_csv(lines, exam_id=None):
+    """CSV rows are ``exam_id,text,correct,choice_1,choice_2,...``; ``correct`` is 1-based."""
+    reader = csv.DictReader(lines)
+    choice_columns = sorted(
+        (name for name in reader.fieldnames or [] if name.startswith('choice_')),
+        key=lambda name: int(name[len('choice_'):]) if name[len('choice_'):].isdigit() else 0,
+    )
+    for row in reader:
+        try:
+            correct = {int(value) for value in (row.get('correct') or '').split('|') if value.strip()}
+        except ValueError:
+            yield reader.line_num, None
+            continue
+        yield reader.line_num, {
+            'exam_id': row.get('exam_id') or exam_id,
+            'text': row.get('text'),
+            'choices': [
+                {'text': row[column], 'is_correct': position in correct}
+                for position, column in enumerate(choice_columns, 1)
+                if row.get(column)
+            ],
+        }
+
+
+def clean_row(row, exam_ids):
+    if not isinstance(row, dict):
+        return None, 'Malformed row.'
+    try:
+        exam_id = int(row.get('exam_id'))
+    except (TypeError, ValueError):
+        return None, 'Missing or invalid exam_id.'
+    if exam_id not in exam_ids:
+        return None, f'Exam {exam_id} does not exist.'
+
+    text = row.get('text')
+    if not isinstance(text, str) or not text.strip():
+        return None, 'Question text is required.'
+
+    choices = row.get('choices')
+    if not isinstance(choices, list) or len(choices) < 2:
+        return None, 'At least two choices are required.'
+    cleaned = []
+    for choice in choices:
+        if not isinstance(choice, dict) or not isinstance(choice.get('text'), str) or not choice['text'].strip():
+            return None, 'Every choice needs text.'
+        if len(choice['text']) > CHOICE_TEXT_LENGTH:
+            return None, f'Choice text is longer than {CHOICE_TEXT_LENGTH} characters.'
+        cleaned.append((choice['text'], bool(choice.get('is_correct'))))
+    if not any(is_correct for _, is_correct in cleaned):
+        return None, 'At least one choice must be correct.'
+
+    return (exam_id, text, cleaned), None
+
+
+def write_chunk(chunk):
+    with transaction.atomic():
+        questions = Question.objects.bulk_create(
+            [Question(exam_id=exam_id, text=text) for exam_id, text, _ in chunk]
+        )
+        Choice.objects.bulk_create(
+            [
+                Choice(question_id=question.id, text=text, is_correct=is_correct)
+                for question, (_, _, choices) in zip(questions, chunk)
+                for text, is_correct in choices
+            ],
+            batch_size=CHUNK_SIZE,
+        )
+
+
+def import_questions(rows, chunk_size=CHUNK_SIZE):
+    """Validate and insert ``(line_number, row)`` pairs, holding at most one chunk in memory.
+
+    Chunks are committed as the input streams, so an input that turns out not to be
+    UTF-8 part way keeps what came before; the report's ``error`` says it stopped.
+    """
+    started = time.monotonic()
+    exam_ids = set(Exam.objects.values_list('id', flat=True))
+    touched = set()
+    chunk = []
+    errors = []
+    error = None
+    total = imported = failed = 0
+
+    try:
+        try:
+            for line_number, row in rows:
+                total += 1
+                cleaned, row_error = clean_row(row, exam_ids)
+                if row_error:
+                    failed += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({'line': line_number, 'error': row_error})
+                    continue
+                chunk.append(cleaned)
+                touched.add(cleaned[0])
+                if len(chunk) >= chunk_size:
+                    write_chunk(chunk)
+                    imported += len(chunk)
+                    chunk = []
+        except UnicodeDecodeError:
+            error = f'The file is not valid UTF-8; stopped after {total} rows.'
+        if chunk:
+            write_chunk(chunk)
+            imported += len(chunk)
+    finally:
+        # bulk_create skips the model signals, so do their work once for whatever
+        # chunks were committed, even if reading the input failed part way.
+        if touched:
+            Exam.update_question_counts(touched)
+            for exam_id in touched:
+                bump_exam_version(exam_id)
+            bump_exam_list_version()
+
+    elapsed = time.monotonic() - started
+    return {
+        'rows': total,
+        'imported': imported,
+        'failed': failed,
+        'errors': errors,
+        'error': error,
+        'exam_ids': sorted(touched),
+        'elapsed': round(elapsed, 3),
+        'rows_per_second': round(total / elapsed, 1) if elapsed else None,
+    }
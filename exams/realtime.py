@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http.request import validate_host
+from django.utils import timezone
+
+from .attempt_state import get_attempt_state, load_saved_answers, save_answers
+from .caching import cache_result
+from .grading import finalize_attempt, invalid_answers
+from .models import ExamAttempt
+
+ATTEMPT_SOCKET_PATH = re.compile(r'^/ws/attempts/(?P<attempt_id>\d+)/$')
+TICK_INTERVAL = 5
+
+CLOSE_NORMAL = 1000
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+
+logger = logging.getLogger(__name__)
+
+
+class SessionScope:
+    def __init__(self, session):
+        self.session = session
+
+
+def get_header(scope, name):
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin1')
+    return None
+
+
+def origin_allowed(scope):
+    origin = get_header(scope, b'origin')
+    if origin is None:
+        return True
+    if origin in settings.CSRF_TRUSTED_ORIGINS:
+        return True
+    return validate_host(urlsplit(origin).hostname or '', settings.ALLOWED_HOSTS)
+
+
+async def authenticate(scope):
+    cookies = SimpleCookie(get_header(scope, b'cookie') or '')
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+    user = await aget_user(SessionScope(session))
+    return user if user.is_authenticated else None
+
+
+def remaining_seconds(state):
+    return max(0, int((state['ends_at'] - timezone.now()).total_seconds()))
+
+
+def log_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error('Attempt socket timer failed.', exc_info=task.exception())
+
+
+def finalize(attempt_id):
+    attempt = ExamAttempt.objects.select_related('exam').get(id=attempt_id)
+    finalize_attempt(attempt)
+    return json.loads(cache_result(attempt)[1])
+
+
+class AttemptSocket:
+    def __init__(self, scope, receive, send):
+        self.scope = scope
+        self.receive = receive
+        self._send = send
+        self.send_lock = asyncio.Lock()
+        self.attempt_id = None
+        self.state = None
+        self.closed = False
+
+    async def send(self, message):
+        async with self.send_lock:
+            if not self.closed:
+                await self._send(message)
+
+    async def send_json(self, data):
+        await self.send({'type': 'websocket.send', 'text': json.dumps(data, cls=DjangoJSONEncoder)})
+
+    async def close(self, code=CLOSE_NORMAL):
+        await self.send({'type': 'websocket.close', 'code': code})
+        self.closed = True
+
+    async def __call__(self):
+        event = await self.receive()
+        if event['type'] != 'websocket.connect':
+            return
+
+        match = ATTEMPT_SOCKET_PATH.match(self.scope['path'])
+        if match is None:
+            return await self.close(CLOSE_NOT_FOUND)
+        if not origin_allowed(self.scope):
+            return await self.close(CLOSE_FORBIDDEN)
+
+        user = await authenticate(self.scope)
+        self.attempt_id = int(match['attempt_id'])
+        self.state = await sync_to_async(get_attempt_state)(self.attempt_id)
+        if user is None or self.state is None or self.state['user_id'] != user.id:
+            return await self.close(CLOSE_FORBIDDEN)
+        if self.state['is_submitted']:
+            return await self.close(CLOSE_NOT_FOUND)
+
+        await self.send({'type': 'websocket.accept'})
+        await self.send_json({
+            'type': 'state',
+            'attempt_id': self.attempt_id,
+            'ends_at': self.state['ends_at'],
+            'remaining': remaining_seconds(self.state),
+            'saved_answers': {
+                str(question_id): choice_id
+                for question_id, choice_id in (await sync_to_async(load_saved_answers)(self.attempt_id)).items()
+            },
+        })
+
+        ticker = asyncio.create_task(self.tick())
+        ticker.add_done_callback(log_failure)
+        try:
+            while not self.closed:
+                event = await self.receive()
+                if event['type'] == 'websocket.disconnect':
+                    break
+                if event['type'] == 'websocket.receive':
+                    await self.handle(event.get('text') or event.get('bytes') or '')
+        finally:
+            ticker.cancel()
+            self.closed = True
+
+    async def tick(self):
+        while not self.closed:
+            remaining = remaining_seconds(self.state)
+            if remaining <= 0:
+                return await self.submit(forced=True)
+            await self.send_json({'type': 'tick', 'remaining': remaining})
+            await asyncio.sleep(min(TICK_INTERVAL, remaining))
+
+    async def submit(self, forced=False):
+        result = await sync_to_async(finalize)(self.attempt_id)
+        await self.send_json({'type': 'submitted', 'forced': forced, 'result': result})
+        await self.close()
+
+    async def handle(self, data):
+        try:
+            message = json.loads(data.decode() if isinstance(data, bytes) else data)
+        except ValueError:  # UnicodeDecodeError included
+            return await self.send_json({'type': 'error', 'error': 'Malformed JSON.'})
+        if not isinstance(message, dict):
+            return await self.send_json({'type': 'error', 'error': 'Expected a JSON object.'})
+
+        if message.get('type') == 'submit':
+            return await self.submit()
+
+        # The attempt may have been submitted over HTTP since the last message.
+        self.state = await sync_to_async(get_attempt_state)(self.attempt_id)
+        if self.state is None or self.state['is_submitted']:
+            await self.send_json({'type': 'error', 'error': 'This attempt has already been submitted.'})
+            return await self.close()
+
+        if remaining_seconds(self.state) <= 0:
+            return await self.submit(forced=True)
+
+        items = message.get('answers', [message])
+        try:
+            if not isinstance(items, list) or not items:
+                raise ValueError
+            answers = {int(item['question_id']): int(item['choice_id']) for item in items}
+        except (KeyError, TypeError, ValueError):
+            return await self.send_json({'type': 'error', 'error': 'Expected question_id and choice_id.'})
+
+        invalid = await sync_to_async(invalid_answers)(self.state, answers)
+        if invalid:
+            return await self.send_json({
+                'type': 'error', 'error': 'Invalid question or choice.', 'question_ids': invalid
+            })
+
+        if not await sync_to_async(save_answers)(self.attempt_id, answers):
+            await self.send_json({'type': 'error', 'error': 'This attempt has already been submitted.'})
+            return await self.close()
+        await self.send_json({'type': 'saved', 'saved': len(answers)})
+
+
+async def attempt_socket(scope, receive, send):
+    await AttemptSocket(scope, receive, send)()
@@ -18,11 +18,13 @@ class QuestionSerializer(serializers.ModelSerializer):
 
 class ExamSerializer(serializers.ModelSerializer):
     course_title = serializers.CharField(source='course.title', read_only=True)
-    question_count = serializers.IntegerField(source='questions.count', read_only=True)
 
     class Meta:
         model = Exam
-        fields = ['id', 'title', 'course_title', 'duration', 'total_marks', 'max_attempts', 'question_count']
+        fields = [
+            'id', 'title', 'course_title', 'duration', 'total_marks', 'max_attempts', 'question_count',
+            'questions_per_attempt',
+        ]
 
 
 class ExamDetailSerializer(serializers.ModelSerializer):
@@ -31,7 +33,10 @@ class ExamDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Exam
-        fields = ['id', 'title', 'course_title', 'duration', 'total_marks', 'max_attempts', 'questions']
+        fields = [
+            'id', 'title', 'course_title', 'duration', 'total_marks', 'max_attempts',
+            'questions_per_attempt', 'questions',
+        ]
 
 
 class SaveAnswerSerializer(serializers.Serializer):
@@ -40,9 +45,19 @@ class SaveAnswerSerializer(serializers.Serializer):
     choice_id = serializers.IntegerField()
 
 
+class AnswerItemSerializer(serializers.Serializer):
+    question_id = serializers.IntegerField()
+    choice_id = serializers.IntegerField()
+
+
+class SaveAnswersSerializer(serializers.Serializer):
+    attempt_id = serializers.IntegerField()
+    answers = AnswerItemSerializer(many=True, allow_empty=False)
+
+
 class AttemptResultSerializer(serializers.ModelSerializer):
     exam_title = serializers.CharField(source='exam.title', read_only=True)
-    total_questions = serializers.IntegerField(source='exam.questions.count', read_only=True)
+    total_questions = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = ExamAttempt
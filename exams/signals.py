@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .attempt_state import invalidate_attempt_state
+from .caching import bump_exam_list_version, bump_exam_version, delete_cached_result
+from .leaderboard import invalidate_leaderboard
+from .models import Choice, Course, Exam, ExamAttempt, Question
+
+
+def bump_on_commit(exam_ids, exam_list=True):
+    def bump():
+        for exam_id in exam_ids:
+            bump_exam_version(exam_id)
+        if exam_list:
+            bump_exam_list_version()
+
+    transaction.on_commit(bump)
+
+
+@receiver([post_save, post_delete], sender=Course)
+def course_changed(sender, instance, **kwargs):
+    bump_on_commit(list(instance.exams.values_list('id', flat=True)))
+
+
+@receiver([post_save, post_delete], sender=Exam)
+def exam_changed(sender, instance, **kwargs):
+    bump_on_commit([instance.id])
+
+
+@receiver(pre_save, sender=Question)
+def question_saving(sender, instance, **kwargs):
+    # A question moved to another exam changes both exams' papers and counts.
+    instance._previous_exam_id = None if instance._state.adding else (
+        Question.objects.filter(id=instance.id).values_list('exam_id', flat=True).first()
+    )
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, created=False, **kwargs):
+    exam_ids = {instance.exam_id}
+    previous_exam_id = getattr(instance, '_previous_exam_id', None)
+    if previous_exam_id is not None:
+        exam_ids.add(previous_exam_id)
+    if created or kwargs['signal'] is post_delete or len(exam_ids) > 1:
+        Exam.update_question_counts(exam_ids)
+    bump_on_commit(exam_ids)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    exam_id = Question.objects.filter(id=instance.question_id).values_list('exam_id', flat=True).first()
+    if exam_id is not None:
+        bump_on_commit([exam_id], exam_list=False)
+
+
+@receiver([post_save, post_delete], sender=ExamAttempt)
+def attempt_changed(sender, instance, **kwargs):
+    if instance.is_submitted:
+        delete_cached_result(instance)
+        invalidate_leaderboard(instance.exam_id)
+    if kwargs['signal'] is post_delete:
+        invalidate_attempt_state(instance.id)
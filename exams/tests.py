@@ -1,3 +1,1121 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, connections, router
+from django.db.models import QuerySet
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from config.instrumentation import registry
+from config.renderers import FastJSONRenderer
+from config.routers import REPLICA_DB_ALIAS, read_from_replica
+
+from . import leaderboard, views
+from .analytics import get_item_statistics
+from .caching import LOCAL_CACHE_TIMEOUT, RESULT_TIMEOUT
+from .benchmark import seed_candidates, seed_catalog, session_overhead, simulate
+from .export import export_attempts
+from .grading import finalize_attempt, finalize_attempts, get_answer_key
+from .idempotency import IN_PROGRESS_TIMEOUT
+from .journal import AnswerJournal, journal
+from .leaderboard import get_leaderboard, get_ranking
+from .models import Answer, Choice, Course, Exam, ExamAttempt, Question
+from .pools import draw_questions
+from .question_bank import import_questions, read_rows
+from .realtime import attempt_socket
+from .warmup import first_requests, warm_caches, write_schema
+
+
+class ExamFixtures:
+    def setUp(self):
+        cache.clear()
+
+    def create_exam(self, questions=0, title='Exam', **fields):
+        """An exam whose questions each have a right and a wrong choice; returns it and the (right, wrong) pairs."""
+        course = Course.objects.create(title='Course')
+        exam = Exam.objects.create(course=course, title=title, duration=30, total_marks=10, **fields)
+        choices = []
+        for number in range(questions):
+            question = Question.objects.create(exam=exam, text=f'Question {number}')
+            choices.append((
+                Choice.objects.create(question=question, text='Right', is_correct=True),
+                Choice.objects.create(question=question, text='Wrong'),
+            ))
+        return exam, choices
+
+
+class ExamTestCase(ExamFixtures, TestCase):
+    pass
+
+
+class AttemptIndexTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('candidate', 'candidate@example.com', 'secret123')
+        self.exam, _ = self.create_exam()
+
+    def create_attempt(self, **kwargs):
+        return ExamAttempt.objects.create(
+            user=self.user, exam=self.exam,
+            ends_at=timezone.now() + timedelta(minutes=30), **kwargs
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_open_attempt_lookup_uses_unique_index(self):
+        queryset = ExamAttempt.objects.filter(user=self.user, exam=self.exam, is_submitted=False)
+        self.assertUsesIndex(queryset, 'exams_attempt_one_open')
+
+    def test_attempt_count_uses_user_exam_index(self):
+        queryset = ExamAttempt.objects.filter(user=self.user, exam=self.exam).order_by()
+        self.assertUsesIndex(queryset.values('id'), 'exams_attempt_user_exam_idx')
+
+    def test_attempt_history_uses_user_exam_index(self):
+        queryset = ExamAttempt.objects.filter(user=self.user, exam=self.exam)
+        self.assertUsesIndex(queryset, 'exams_attempt_user_exam_idx')
+
+    def test_expired_lookup_uses_deadline_index(self):
+        queryset = ExamAttempt.objects.filter(is_submitted=False, ends_at__lt=timezone.now()).order_by()
+        self.assertUsesIndex(queryset, 'exams_attempt_open_ends_idx')
+
+    def test_only_one_open_attempt_per_user_and_exam(self):
+        self.create_attempt(is_submitted=True)
+        self.create_attempt()
+        with self.assertRaises(IntegrityError):
+            self.create_attempt()
+
+
+class ExamPaperTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, [(self.choice, _)] = self.create_exam(questions=1)
+        self.client.force_login(User.objects.create_user('candidate'))
+        self.url = f'/api/exams/{self.exam.id}/'
+
+    def test_warm_paper_is_served_without_exam_queries(self):
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual([query['sql'] for query in queries if 'exams_' in query['sql']], [])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+    def test_edits_publish_a_new_paper_on_commit(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.choice.text = 'Edited'
+            self.choice.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['questions'][0]['choices'][0]['text'], 'Edited')
+
+
+class CatalogSignalTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first, _ = self.create_exam(title='First')
+        self.second, _ = self.create_exam(title='Second')
+        self.client.force_login(User.objects.create_user('candidate'))
+
+    def counts(self):
+        return list(Exam.objects.order_by('id').values_list('question_count', flat=True))
+
+    def listing(self):
+        return [(exam['title'], exam['question_count']) for exam in self.client.get('/api/exams/').json()]
+
+    def test_question_counts_follow_creates_moves_and_deletes(self):
+        question = Question.objects.create(exam=self.first, text='Moving')
+        Question.objects.create(exam=self.first, text='Staying')
+        self.assertEqual(self.counts(), [2, 0])
+
+        question.text = 'Edited'
+        with self.assertNumQueries(2):
+            # Where it was, then the update itself; the counts are left alone.
+            question.save()
+        question.exam = self.second
+        question.save()
+        self.assertEqual(self.counts(), [1, 1])
+
+        question.delete()
+        self.assertEqual(self.counts(), [1, 0])
+
+    def test_cached_papers_and_list_are_refreshed_on_commit(self):
+        question = Question.objects.create(exam=self.first, text='Moving')
+        self.assertEqual(self.listing(), [('First', 1), ('Second', 0)])
+        self.assertEqual(len(self.client.get(f'/api/exams/{self.first.id}/').json()['questions']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_exam(title='Third')
+            question.exam = self.second
+            question.save()
+
+        self.assertEqual(self.listing(), [('First', 0), ('Second', 1), ('Third', 0)])
+        self.assertEqual(self.client.get(f'/api/exams/{self.first.id}/').json()['questions'], [])
+        second = self.client.get(f'/api/exams/{self.second.id}/').json()
+        self.assertEqual([item['id'] for item in second['questions']], [question.id])
+
+
+class ExpireAttemptsCommandTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, [(self.right, _)] = self.create_exam(questions=1)
+
+    def attempt(self, username, ends_at):
+        attempt = ExamAttempt.objects.create(user=User.objects.create_user(username), exam=self.exam, ends_at=ends_at)
+        Answer.objects.create(attempt=attempt, question=self.right.question, choice=self.right)
+        return attempt
+
+    def test_only_expired_attempts_are_graded(self):
+        expired = self.attempt('expired', timezone.now() - timedelta(seconds=1))
+        live = self.attempt('live', timezone.now() + timedelta(minutes=5))
+
+        call_command('expire_attempts', stdout=StringIO())
+
+        expired.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual((expired.is_submitted, expired.score), (True, 1))
+        self.assertFalse(live.is_submitted)
+        self.assertTrue(Answer.objects.filter(attempt=live).exists())
+
+
+class ResultCacheTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, _ = self.create_exam(questions=1)
+        self.client.force_login(User.objects.create_user('candidate'))
+        self.attempt_id = self.client.post(f'/api/exams/{self.exam.id}/start/').json()['attempt_id']
+        self.url = f'/api/exams/result/{self.attempt_id}/'
+
+    def test_live_attempt_result_is_not_cached(self):
+        response = self.client.get(self.url)
+        self.assertFalse(response.json()['is_submitted'])
+        self.assertNotIn('ETag', response)
+
+    def test_submitted_result_is_cached_and_revalidated(self):
+        self.client.post(f'/api/exams/{self.exam.id}/submit/')
+
+        with self.assertNumQueries(2):
+            # Only the session and the user: the result itself comes from the cache.
+            response = self.client.get(self.url)
+        self.assertTrue(response.json()['is_submitted'])
+        self.assertEqual(response['Cache-Control'], f'private, max-age={RESULT_TIMEOUT}, immutable')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_regrading_drops_the_cached_result(self):
+        self.client.post(f'/api/exams/{self.exam.id}/submit/')
+        etag = self.client.get(self.url)['ETag']
+
+        attempt = ExamAttempt.objects.get(id=self.attempt_id)
+        attempt.score = 1
+        attempt.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.json()['score']), (200, 1))
+
+
+class LoadSimulationTests(ExamTestCase):
+    def test_lifecycle_query_budget(self):
+        exams = seed_catalog(courses=1, exams=2, questions=5, choices=3)
+        report = simulate(exams, candidates=4, saves=5)
+
+        self.assertEqual(report['save_answer']['requests'], 20)
+        # save_answer and submit each run a transaction; under TestCase that adds a
+        # savepoint and its release to the count.
+        budgets = {'exam_list': 3, 'start': 8, 'save_answer': 7, 'submit': 9, 'result': 2}
+        for endpoint, budget in budgets.items():
+            self.assertLessEqual(report[endpoint]['queries_max'], budget, endpoint)
+
+
+class AttemptStateTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, self.choices = self.create_exam(questions=2)
+        self.client.force_login(User.objects.create_user('candidate'))
+        self.attempt_id = self.client.post(f'/api/exams/{self.exam.id}/start/').json()['attempt_id']
+
+    def save(self, choice):
+        return self.client.post('/api/exams/save-answer/', {
+            'attempt_id': self.attempt_id, 'question_id': choice.question_id, 'choice_id': choice.id,
+        }, content_type='application/json')
+
+    def test_warm_save_reads_only_whether_the_attempt_is_open(self):
+        (first, _), (second, _) = self.choices
+        self.save(first)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.save(second)
+        self.assertEqual(response.status_code, 200)
+        reads = [query['sql'] for query in queries if query['sql'].startswith('SELECT') and 'exams_' in query['sql']]
+        # The cached state may be another worker's, so the write itself checks the attempt.
+        self.assertEqual(len(reads), 1)
+        self.assertIn('"exams_examattempt"."is_submitted"', reads[0])
+
+    @override_settings(SHARED_CACHE=True)
+    def test_warm_save_with_a_shared_cache_only_writes(self):
+        (first, _), (second, _) = self.choices
+        self.save(first)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.save(second)
+        self.assertEqual(response.status_code, 200)
+        exams_queries = [query['sql'] for query in queries if 'exams_' in query['sql']]
+        self.assertEqual(len(exams_queries), 1)
+        self.assertTrue(exams_queries[0].startswith('INSERT INTO "exams_answer"'))
+
+    def test_resume_returns_the_saved_answers(self):
+        (first, _), (_, second) = self.choices
+        self.save(first)
+        self.save(second)
+
+        saved = self.client.post(f'/api/exams/{self.exam.id}/start/').json()['saved_answers']
+        self.assertEqual(saved, {str(first.question_id): first.id, str(second.question_id): second.id})
+
+
+class SessionCacheTests(ExamTestCase):
+    def test_cached_sessions_skip_the_session_table(self):
+        seed_catalog(courses=1, exams=1, questions=2, choices=2)
+        user = seed_candidates(1)[0]
+
+        db = session_overhead('django.contrib.sessions.backends.db', user, requests=4)
+        cached = session_overhead('django.contrib.sessions.backends.cached_db', user, requests=4)
+        self.assertEqual(db['session_queries'], 1)
+        self.assertEqual(cached['session_queries'], 0)
+
+
+class StaleAttemptStateTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, [(self.choice, _)] = self.create_exam(questions=1)
+        self.question = self.choice.question
+        self.client.force_login(User.objects.create_user('candidate'))
+
+    def test_save_after_submit_elsewhere_is_rejected(self):
+        attempt_id = self.client.post(f'/api/exams/{self.exam.id}/start/').json()['attempt_id']
+        # Another worker submitted; this worker's cached state still says the attempt is open.
+        ExamAttempt.objects.filter(id=attempt_id).update(is_submitted=True)
+
+        response = self.client.post('/api/exams/save-answer/', {
+            'attempt_id': attempt_id, 'question_id': self.question.id, 'choice_id': self.choice.id,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Answer.objects.filter(attempt_id=attempt_id).exists())
+
+
+class SaveAnswersTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, self.choices = self.create_exam(questions=3)
+        self.client.force_login(User.objects.create_user('candidate'))
+        self.attempt_id = self.client.post(f'/api/exams/{self.exam.id}/start/').json()['attempt_id']
+
+    def save(self, *choices):
+        return self.client.post('/api/exams/save-answers/', {
+            'attempt_id': self.attempt_id,
+            'answers': [{'question_id': question_id, 'choice_id': choice.id} for question_id, choice in choices],
+        }, content_type='application/json')
+
+    def saved(self):
+        return dict(Answer.objects.filter(attempt_id=self.attempt_id).values_list('question_id', 'choice_id'))
+
+    def test_invalid_pairs_reject_the_whole_batch(self):
+        (right, _), (other, _), _ = self.choices
+        response = self.save((right.question_id, right), (right.question_id + 1000, right), (right.question_id, other))
+
+        self.assertEqual(response.status_code, 400)
+        # The later pair for the first question gives it another question's choice.
+        self.assertEqual(response.json()['question_ids'], [right.question_id, right.question_id + 1000])
+        self.assertEqual(self.saved(), {})
+
+    def test_later_pair_for_a_question_wins(self):
+        right, wrong = self.choices[0]
+        response = self.save((right.question_id, right), (right.question_id, wrong))
+        self.assertEqual(response.json(), {'status': 'ok', 'saved': 1})
+        self.assertEqual(self.saved(), {right.question_id: wrong.id})
+
+    def test_batch_is_written_in_one_upsert(self):
+        self.save(*((right.question_id, right) for right, _ in self.choices[:2]))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.save(*((right.question_id, wrong) for right, wrong in self.choices))
+        self.assertEqual(response.json()['saved'], 3)
+        writes = [query['sql'] for query in queries if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('ON CONFLICT', writes[0])
+        self.assertEqual(self.saved(), {right.question_id: wrong.id for right, wrong in self.choices})
+
+
+class AttemptSocketTests(ExamFixtures, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, [(self.choice, _)] = self.create_exam(questions=1)
+        self.question = self.choice.question
+        self.client.force_login(User.objects.create_user('candidate'))
+        self.attempt_id = self.client.post(f'/api/exams/{self.exam.id}/start/').json()['attempt_id']
+
+    def converse(self, *texts, before=None):
+        """Connect, send ``texts`` and return the frames the server sent, timer ticks aside.
+
+        ``before`` is awaited once the connection is set up, before any text is handled.
+        """
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        scope = {'type': 'websocket', 'path': f'/ws/attempts/{self.attempt_id}/', 'headers': [(b'cookie', cookie.encode())]}
+        events = [
+            {'type': 'websocket.connect'},
+            *({'type': 'websocket.receive', 'bytes' if isinstance(text, bytes) else 'text': text} for text in texts),
+            {'type': 'websocket.disconnect'},
+        ]
+        sent = []
+
+        async def receive():
+            event = events.pop(0)
+            if event['type'] == 'websocket.receive' and before and len(events) == len(texts):
+                await before()
+            return event
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(asyncio.wait_for(attempt_socket(scope, receive, send), 5))
+        frames = [json.loads(message['text']) if 'text' in message else message for message in sent]
+        return [frame for frame in frames if frame['type'] != 'tick']
+
+    def test_answers_are_saved_and_submit_returns_the_result(self):
+        frames = self.converse(
+            json.dumps({'question_id': self.question.id, 'choice_id': self.choice.id}),
+            'not json',
+            json.dumps({'type': 'submit'}),
+        )
+
+        self.assertEqual([frame['type'] for frame in frames], [
+            'websocket.accept', 'state', 'saved', 'error', 'submitted', 'websocket.close',
+        ])
+        self.assertEqual(frames[2]['saved'], 1)
+        self.assertEqual(frames[3]['error'], 'Malformed JSON.')
+        self.assertEqual((frames[4]['forced'], frames[4]['result']['score']), (False, 1))
+
+    def test_non_object_messages_get_an_error_frame(self):
+        frames = self.converse('[1, 2]', json.dumps({'question_id': self.question.id, 'choice_id': self.choice.id}))
+        self.assertEqual(frames[-2], {'type': 'error', 'error': 'Expected a JSON object.'})
+        self.assertEqual(frames[-1], {'type': 'saved', 'saved': 1})
+
+    def test_empty_batches_and_undecodable_bytes_get_an_error_frame(self):
+        frames = self.converse(
+            json.dumps({'answers': []}), json.dumps({'answers': {'1': 2}}), b'\xff{}',
+            json.dumps({'question_id': self.question.id, 'choice_id': self.choice.id}).encode(),
+        )
+        self.assertEqual([frame.get('error') for frame in frames[2:]], [
+            'Expected question_id and choice_id.', 'Expected question_id and choice_id.', 'Malformed JSON.', None,
+        ])
+        self.assertEqual(frames[-1], {'type': 'saved', 'saved': 1})
+
+    @override_settings(ANSWER_WRITE_BEHIND=True)
+    def test_message_after_http_submit_is_rejected(self):
+        async def submit():
+            await asyncio.to_thread(self.client.post, f'/api/exams/{self.exam.id}/submit/')
+
+        # With write-behind the save itself cannot tell; the socket has to re-read the state.
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(journal, 'path', f'{directory}/answers.journal'):
+            frames = self.converse(
+                json.dumps({'question_id': self.question.id, 'choice_id': self.choice.id}), before=submit
+            )
+            self.assertEqual(journal.depth(), 0)
+        self.assertEqual(frames[-2]['error'], 'This attempt has already been submitted.')
+        self.assertEqual(frames[-1]['type'], 'websocket.close')
+        self.assertFalse(Answer.objects.filter(attempt_id=self.attempt_id).exists())
+        self.assertEqual(ExamAttempt.objects.get(id=self.attempt_id).score, 0)
+
+
+@override_settings(ANSWER_WRITE_BEHIND=True)
+class AnswerJournalTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, choices = self.create_exam(questions=2)
+        self.answers = [{'question_id': right.question_id, 'choice_id': right.id} for right, _ in choices]
+        self.client.force_login(User.objects.create_user('candidate'))
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Flushes happen on the paths under test rather than on a background thread.
+        for patch in [mock.patch.object(journal, 'path', f'{directory.name}/answers.journal'),
+                      mock.patch.object(journal, 'start_worker')]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def start_and_save(self):
+        attempt_id = self.client.post(f'/api/exams/{self.exam.id}/start/').json()['attempt_id']
+        self.client.post('/api/exams/save-answers/', {'attempt_id': attempt_id, 'answers': self.answers},
+                         content_type='application/json')
+        self.assertEqual(journal.depth(), 2)
+        self.assertFalse(Answer.objects.exists())
+        return attempt_id
+
+    def test_journaled_answers_are_resumed_and_graded_on_submit(self):
+        self.start_and_save()
+        saved = self.client.post(f'/api/exams/{self.exam.id}/start/').json()['saved_answers']
+        self.assertEqual(saved, {str(answer['question_id']): answer['choice_id'] for answer in self.answers})
+
+        result = self.client.post(f'/api/exams/{self.exam.id}/submit/').json()
+        self.assertEqual(result['score'], 2)
+        self.assertEqual(journal.depth(), 0)
+
+    def test_resume_reads_only_its_own_journaled_answers(self):
+        attempt_id = self.start_and_save()
+        first, second = self.answers
+        wrong = {
+            answer['question_id']: Choice.objects.get(question_id=answer['question_id'], is_correct=False).id
+            for answer in self.answers
+        }
+        # An older saved row, the journaled lines of a flush still pending, then a change of mind.
+        Answer.objects.create(attempt_id=attempt_id, question_id=second['question_id'],
+                              choice_id=wrong[second['question_id']])
+        journal.rotate()
+        journal.append(attempt_id, {first['question_id']: wrong[first['question_id']]})
+        journal.append(attempt_id + 1, {second['question_id']: wrong[second['question_id']]})
+
+        saved = self.client.post(f'/api/exams/{self.exam.id}/start/').json()['saved_answers']
+        self.assertEqual(saved, {
+            str(first['question_id']): wrong[first['question_id']],
+            str(second['question_id']): second['choice_id'],
+        })
+        self.assertEqual(journal.depth(), 4)
+        self.assertEqual(Answer.objects.count(), 1)
+
+    def test_journaled_answers_are_graded_on_expiry(self):
+        attempt_id = self.start_and_save()
+        ExamAttempt.objects.filter(id=attempt_id).update(ends_at=timezone.now() - timedelta(minutes=1))
+
+        call_command('expire_attempts', stdout=StringIO())
+        self.assertEqual(ExamAttempt.objects.get(id=attempt_id).score, 2)
+
+    def test_counters_are_shared_and_reported_in_metrics(self):
+        self.start_and_save()
+        # Another worker's flusher picks up the journal; this process did the appending.
+        AnswerJournal(journal.path).flush()
+        self.client.force_login(User.objects.create_superuser('admin'))
+
+        counters = self.client.get('/api/metrics/').json()['answer_journal']
+        self.assertEqual((counters['appended'], counters['flushed'], counters['depth']), (2, 2, 0))
+        prometheus = self.client.get('/api/metrics/?format=prometheus').content.decode()
+        self.assertIn('exam_answer_journal{stat="flushed"} 2', prometheus)
+
+
+class IdempotencyTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, _ = self.create_exam(questions=1)
+        self.client.force_login(User.objects.create_user('candidate'))
+
+    def post(self, path, key):
+        return self.client.post(path, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_is_replayed(self):
+        first = self.post(f'/api/exams/{self.exam.id}/start/', 'start-1')
+        retry = self.post(f'/api/exams/{self.exam.id}/start/', 'start-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.content), (201, first.content))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', first)
+        self.assertEqual(ExamAttempt.objects.count(), 1)
+
+    def test_concurrent_requests_with_one_key_run_once(self):
+        for path, name in [(f'/api/exams/{self.exam.id}/start/', 'open_attempt'),
+                           (f'/api/exams/{self.exam.id}/submit/', 'finalize_attempt')]:
+            with self.subTest(path=path):
+                original = getattr(views, name)
+                concurrent = []
+
+                def run_with_retry(*args):
+                    # The retry arrives while the first request is still being handled.
+                    concurrent.append(self.post(path, name))
+                    return original(*args)
+
+                with mock.patch.object(views, name, side_effect=run_with_retry) as handler, \
+                        mock.patch.object(cache, 'add', wraps=cache.add) as add:
+                    first = self.post(path, name)
+                    retry = self.post(path, name)
+
+                self.assertEqual(handler.call_count, 1)
+                self.assertEqual(concurrent[0].status_code, 409)
+                self.assertEqual(retry.content, first.content)
+                self.assertEqual(retry['Idempotent-Replayed'], 'true')
+                # The marker outlives a worker killed mid-request only briefly.
+                self.assertEqual(add.call_args.args[2], IN_PROGRESS_TIMEOUT)
+
+        attempt = ExamAttempt.objects.get()
+        self.assertTrue(attempt.is_submitted)
+
+    def test_refusals_are_not_replayed(self):
+        submit = f'/api/exams/{self.exam.id}/submit/'
+        # Nothing to submit yet: the 404 must not stick to the key once there is.
+        self.assertEqual(self.post(submit, 'submit-1').status_code, 404)
+        self.post(f'/api/exams/{self.exam.id}/start/', 'start-1')
+        self.assertEqual(self.post(submit, 'submit-1').status_code, 200)
+
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(User.objects.create_user('other'))
+        start = f'/api/exams/{self.exam.id}/start/'
+        self.assertEqual(client.post(start, HTTP_IDEMPOTENCY_KEY='start-2').status_code, 403)
+        client.cookies[settings.CSRF_COOKIE_NAME] = token = 'x' * 32
+        response = client.post(start, HTTP_IDEMPOTENCY_KEY='start-2', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+
+class AsyncViewTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, choices = self.create_exam(questions=2)
+        self.answers = [{'question_id': right.question_id, 'choice_id': right.id} for right, _ in choices]
+        self.async_client.force_login(User.objects.create_user('candidate'))
+
+    async def post(self, path, data=None, **headers):
+        return await self.async_client.post(path, data or {}, content_type='application/json', headers=headers)
+
+    async def test_attempt_lifecycle(self):
+        start = await self.post(f'/api/exams/async/{self.exam.id}/start/')
+        self.assertEqual(start.status_code, 201)
+        attempt_id = start.json()['attempt_id']
+
+        saved = await self.post('/api/exams/async/save-answer/', {'attempt_id': attempt_id, **self.answers[0]})
+        self.assertEqual(saved.json(), {'status': 'ok'})
+        wrong_question = {**self.answers[1], 'choice_id': self.answers[0]['choice_id']}
+        invalid = await self.post('/api/exams/async/save-answer/', {'attempt_id': attempt_id, **wrong_question})
+        self.assertEqual(invalid.status_code, 404)
+
+        resumed = await self.post(f'/api/exams/async/{self.exam.id}/start/')
+        self.assertEqual(resumed.json()['saved_answers'], {str(self.answers[0]['question_id']): self.answers[0]['choice_id']})
+
+        result = (await self.post(f'/api/exams/async/{self.exam.id}/submit/')).json()
+        self.assertEqual((result['score'], result['total_questions']), (1, 2))
+        fetched = await self.async_client.get(f'/api/exams/async/result/{attempt_id}/')
+        self.assertEqual(fetched.json(), result)
+
+        late = await self.post('/api/exams/async/save-answer/', {'attempt_id': attempt_id, **self.answers[1]})
+        self.assertEqual(late.status_code, 404)
+
+    async def test_idempotency_key_is_honored(self):
+        start = await self.post(f'/api/exams/async/{self.exam.id}/start/', idempotency_key='start')
+        retry = await self.post(f'/api/exams/async/{self.exam.id}/start/', idempotency_key='start')
+        self.assertEqual((retry.status_code, retry.content), (201, start.content))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        attempt_id = start.json()['attempt_id']
+
+        data = {'attempt_id': attempt_id, **self.answers[0]}
+        await self.post('/api/exams/async/save-answer/', data, idempotency_key='save')
+        replayed = await self.post('/api/exams/async/save-answer/', data, idempotency_key='save')
+        self.assertEqual(replayed['Idempotent-Replayed'], 'true')
+
+        submit = await self.post(f'/api/exams/async/{self.exam.id}/submit/', idempotency_key='submit')
+        retry = await self.post(f'/api/exams/async/{self.exam.id}/submit/', idempotency_key='submit')
+        self.assertEqual((retry.status_code, retry.content), (200, submit.content))
+        self.assertEqual(await ExamAttempt.objects.acount(), 1)
+
+    def test_asgi_entry_point_disables_persistent_connections(self):
+        code = 'import config.asgi; from django.db import connection; print(connection.settings_dict["CONN_MAX_AGE"])'
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR, env={**os.environ, 'DB_CONN_MAX_AGE': '600'}, text=True
+        )
+        self.assertEqual(output.strip(), '0')
+
+
+class ItemAnalysisTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, choices = self.create_exam(questions=2)
+        self.questions = [(right.question, right, wrong) for right, wrong in choices]
+
+    def submit(self, username, *picks):
+        user = User.objects.create_user(username)
+        attempt = ExamAttempt.objects.create(user=user, exam=self.exam, ends_at=timezone.now())
+        for (question, right, wrong), correct in zip(self.questions, picks):
+            Answer.objects.create(attempt=attempt, question=question, choice=right if correct else wrong)
+        finalize_attempt(attempt)
+
+    def test_report_updates_incrementally(self):
+        self.submit('a', True, True)
+        self.submit('b', True, False)
+        self.assertEqual(get_item_statistics(self.exam.id).count, 2)
+
+        self.submit('c', False, False)
+        self.submit('d', True, True)
+        with self.assertNumQueries(2):
+            report = get_item_statistics(self.exam.id).report()
+
+        self.assertEqual(report['attempts'], 4)
+        self.assertEqual(report['scores']['histogram'], [1, 1, 2])
+        self.assertEqual(report['scores']['percentiles']['50'], 1)
+        first, second = report['questions']
+        self.assertEqual(first['difficulty'], 0.75)
+        self.assertEqual(second['difficulty'], 0.5)
+        self.assertAlmostEqual(second['discrimination'], 0.9045, places=4)
+        self.assertEqual([choice['count'] for choice in first['choices']], [3, 1])
+
+
+@override_settings(SHARED_CACHE=True)
+class LeaderboardTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, [(self.right, self.wrong)] = self.create_exam(questions=1)
+
+    def finalize(self, username, choice):
+        attempt = ExamAttempt.objects.create(
+            user=User.objects.create_user(username), exam=self.exam,
+            ends_at=timezone.now() + timedelta(minutes=30)
+        )
+        Answer.objects.create(attempt=attempt, question=choice.question, choice=choice)
+        finalize_attempt(attempt)
+        return attempt
+
+    def test_finalize_updates_cached_leaderboard(self):
+        self.finalize('first', self.right)
+        get_leaderboard(self.exam.id)
+        attempt = self.finalize('second', self.wrong)
+        self.finalize('third', self.right)
+
+        with self.assertNumQueries(1):
+            ranking = get_ranking(attempt)
+        self.assertEqual((ranking['rank'], ranking['total']), (3, 3))
+        self.assertAlmostEqual(ranking['percentile'], 16.67)
+        self.assertEqual([entry['username'] for entry in ranking['leaderboard']], ['first', 'third', 'second'])
+
+    def test_board_built_while_a_score_is_recorded_is_not_kept(self):
+        self.finalize('first', self.right)
+        store = leaderboard.store_leaderboard
+
+        def finalize_then_store(exam_id, board):
+            # The rebuild read the table before this attempt was finalized.
+            if not ExamAttempt.objects.filter(user__username='late').exists():
+                self.finalize('late', self.right)
+            store(exam_id, board)
+
+        with mock.patch.object(leaderboard, 'store_leaderboard', side_effect=finalize_then_store):
+            self.assertEqual(get_leaderboard(self.exam.id).total, 1)
+        self.assertEqual(get_leaderboard(self.exam.id).total, 2)
+
+    def test_score_committed_before_a_rebuild_is_not_counted_twice(self):
+        attempt = ExamAttempt.objects.create(
+            user=User.objects.create_user('first'), exam=self.exam, ends_at=timezone.now()
+        )
+        leaderboard.begin_scores(self.exam.id)
+        ExamAttempt.objects.filter(id=attempt.id).update(is_submitted=True, score=1)
+        # A reader rebuilds between the commit and the record that follows it.
+        self.assertEqual(get_leaderboard(self.exam.id).total, 1)
+        leaderboard.record_scores(self.exam.id, [(attempt.id, attempt.user_id, 1)])
+        self.assertEqual(get_leaderboard(self.exam.id).total, 1)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_board_is_rebuilt_per_read_without_a_shared_cache(self):
+        self.finalize('first', self.right)
+        attempt = ExamAttempt.objects.create(
+            user=User.objects.create_user('second'), exam=self.exam, ends_at=timezone.now()
+        )
+        get_leaderboard(self.exam.id)
+        # Another worker's finalize: its generation bump lands in its own cache, not this one.
+        ExamAttempt.objects.filter(id=attempt.id).update(is_submitted=True, score=1)
+        self.assertEqual(get_leaderboard(self.exam.id).total, 2)
+
+
+class QuestionImportTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, _ = self.create_exam()
+
+    def test_csv_import_skips_invalid_rows_and_refreshes_counts(self):
+        lines = [
+            'text,correct,choice_1,choice_2,choice_3\n',
+            'Capital of France?,2,Berlin,Paris,Rome\n',
+            'No answer marked,,Yes,No,\n',
+            'Two choices,1,Yes,No,\n',
+        ]
+        report = import_questions(read_rows(lines, 'csv', self.exam.id), chunk_size=1)
+
+        self.assertEqual((report['rows'], report['imported'], report['failed']), (3, 2, 1))
+        self.assertEqual(report['errors'], [{'line': 3, 'error': 'At least one choice must be correct.'}])
+        self.assertEqual(Choice.objects.get(is_correct=True, question__text='Capital of France?').text, 'Paris')
+        self.exam.refresh_from_db()
+        self.assertEqual(self.exam.question_count, 2)
+
+    def test_upload_that_stops_being_utf8_reports_what_was_imported(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+        row = json.dumps({'text': 'Question', 'choices': [{'text': 'Yes', 'is_correct': True}, {'text': 'No'}]})
+        upload = SimpleUploadedFile('bank.jsonl', f'{row}\n{row}\n'.encode() + b'\xff\n' + f'{row}\n'.encode())
+
+        response = self.client.post('/api/exams/questions/import/', {'file': upload, 'exam_id': self.exam.id})
+        self.assertEqual(response.status_code, 400)
+        report = response.json()
+        self.assertEqual((report['rows'], report['imported']), (2, 2))
+        self.assertEqual(report['error'], 'The file is not valid UTF-8; stopped after 2 rows.')
+        self.assertEqual(Question.objects.filter(exam=self.exam).count(), 2)
+
+    def test_command_prints_the_report_before_failing_on_bad_utf8(self):
+        row = json.dumps({'text': 'Question', 'choices': [{'text': 'Yes', 'is_correct': True}, {'text': 'No'}]})
+        with tempfile.NamedTemporaryFile(suffix='.jsonl') as bank:
+            # Past the first read buffer, so the bad byte surfaces mid-stream.
+            bank.write(f'{row}\n'.encode() * 200 + b'\xff\n')
+            bank.flush()
+            stdout = StringIO()
+            with self.assertRaisesMessage(CommandError, 'not valid UTF-8'):
+                call_command('import_questions', bank.name, exam=self.exam.id, chunk_size=50, stdout=stdout)
+
+        # Rows decoded before the bad buffer are in, and the report counts exactly those.
+        imported = Question.objects.filter(exam=self.exam).count()
+        self.assertGreater(imported, 0)
+        self.assertIn(f'Imported {imported} of {imported} questions', stdout.getvalue())
+
+
+class ExportTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, [(right, _)] = self.create_exam(questions=1)
+        for number in range(5):
+            attempt = ExamAttempt.objects.create(
+                user=User.objects.create_user(f'candidate{number}'), exam=self.exam,
+                is_submitted=True, ends_at=timezone.now()
+            )
+            if number % 2:
+                Answer.objects.create(attempt=attempt, question=right.question, choice=right)
+
+    def test_csv_export_writes_one_row_per_answer_in_chunks(self):
+        # Attempts, the answer key, then one answer query per chunk of two attempts.
+        with self.assertNumQueries(1 + 1 + 3):
+            content = b''.join(export_attempts('csv', chunk_size=2, exam_id=self.exam.id)).decode()
+
+        rows = content.splitlines()
+        self.assertEqual(len(rows), 6)
+        self.assertTrue(rows[2].endswith(',True'))
+        self.assertTrue(rows[1].endswith(',,,'))
+
+
+class GradingTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exams = [self.create_exam(questions=3, title=title) for title in ['First', 'Second']]
+
+    def attempt(self, username, exam_index, picks):
+        """An open attempt answering each question right (True), wrong (False) or not at all (None)."""
+        exam, choices = self.exams[exam_index]
+        attempt = ExamAttempt.objects.create(
+            user=User.objects.create_user(username), exam=exam, ends_at=timezone.now()
+        )
+        for (right, wrong), pick in zip(choices, picks):
+            if pick is not None:
+                Answer.objects.create(attempt=attempt, question=right.question, choice=right if pick else wrong)
+        return attempt
+
+    def test_single_attempt_is_graded_once(self):
+        attempt = self.attempt('candidate', 0, [True, False, True])
+
+        self.assertTrue(finalize_attempt(attempt))
+        self.assertEqual(attempt.score, 2)
+        # A second finalize, e.g. the expiry sweep racing a submit, leaves the first result.
+        again = ExamAttempt.objects.get(id=attempt.id)
+        self.assertFalse(finalize_attempt(again))
+        self.assertEqual((again.score, again.answer_map()), (2, attempt.answer_map()))
+
+    def test_answer_key_is_cached_until_a_choice_changes(self):
+        exam, [(right, wrong), *_] = self.exams[0]
+        self.assertEqual(get_answer_key(exam.id).score([right.id, wrong.id]), 1)
+        with self.assertNumQueries(0):
+            get_answer_key(exam.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            wrong.is_correct = True
+            wrong.save()
+        self.assertEqual(get_answer_key(exam.id).score([right.id, wrong.id]), 2)
+
+    def test_answer_key_edited_by_another_process(self):
+        exam, [(right, wrong), *_] = self.exams[0]
+        for shared, score in [(True, 1), (False, 2)]:
+            with self.subTest(shared=shared), override_settings(SHARED_CACHE=shared):
+                cache.clear()
+                get_answer_key(exam.id)
+                # Another process's edit: its version bump lands in its own cache, not this one.
+                Choice.objects.filter(id=wrong.id).update(is_correct=True)
+                later = time.time() + LOCAL_CACHE_TIMEOUT + 1
+                with mock.patch('django.core.cache.backends.locmem.time.time', return_value=later):
+                    self.assertEqual(get_answer_key(exam.id).score([right.id, wrong.id]), score)
+                Choice.objects.filter(id=wrong.id).update(is_correct=False)
+
+    def test_bulk_grading_scores_each_attempt_on_its_own_exam(self):
+        attempts = [
+            self.attempt('a', 0, [True, True, True]),
+            self.attempt('b', 0, [False, None, True]),
+            self.attempt('c', 1, [None, None, None]),
+            self.attempt('d', 1, [True, False, False]),
+        ]
+        finalize_attempt(attempts[3])
+
+        self.assertEqual(finalize_attempts([attempt.id for attempt in attempts]), 3)
+        scores = dict(ExamAttempt.objects.values_list('user__username', 'score'))
+        self.assertEqual(scores, {'a': 3, 'b': 1, 'c': 0, 'd': 1})
+        self.assertFalse(Answer.objects.exists())
+        (_, first_wrong), _, (third_right, _) = self.exams[0][1]
+        self.assertEqual(ExamAttempt.objects.get(user__username='b').answer_map(), {
+            first_wrong.question_id: first_wrong.id, third_right.question_id: third_right.id,
+        })
+
+
+class PackedAnswerTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, choices = self.create_exam(questions=3)
+        self.user = User.objects.create_user('candidate')
+        (first, _), (_, second), (third, _) = choices
+        # Two right answers and one wrong one.
+        self.answers = {choice.question_id: choice.id for choice in [first, second, third]}
+
+    def test_finalize_packs_answers_and_drops_rows(self):
+        attempt = ExamAttempt.objects.create(user=self.user, exam=self.exam, ends_at=timezone.now())
+        for question_id, choice_id in self.answers.items():
+            Answer.objects.create(attempt=attempt, question_id=question_id, choice_id=choice_id)
+
+        finalize_attempt(attempt)
+
+        attempt = ExamAttempt.objects.get(id=attempt.id)
+        self.assertEqual(attempt.score, 2)
+        self.assertEqual(len(attempt.packed_answers), 8 * 3)
+        self.assertFalse(Answer.objects.filter(attempt=attempt).exists())
+        self.assertEqual(attempt.answer_map(), self.answers)
+
+    def test_failed_finalize_leaves_the_attempt_open_with_its_answers(self):
+        attempt = ExamAttempt.objects.create(user=self.user, exam=self.exam, ends_at=timezone.now())
+        for question_id, choice_id in self.answers.items():
+            Answer.objects.create(attempt=attempt, question_id=question_id, choice_id=choice_id)
+
+        with mock.patch.object(QuerySet, 'delete', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            finalize_attempt(attempt)
+
+        self.assertFalse(ExamAttempt.objects.get(id=attempt.id).is_submitted)
+        self.assertEqual(Answer.objects.filter(attempt=attempt).count(), 3)
+
+
+class QuestionPoolTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, choices = self.create_exam(questions=8, questions_per_attempt=3)
+        self.correct = {right.question_id: right.id for right, _ in choices}
+        self.user = User.objects.create_user('candidate')
+        self.client.force_login(self.user)
+
+    def test_attempt_draws_its_own_paper_and_is_graded_on_it(self):
+        self.assertEqual(self.client.get(f'/api/exams/{self.exam.id}/').json()['questions'], [])
+        attempt_id = self.client.post(f'/api/exams/{self.exam.id}/start/').json()['attempt_id']
+        self.assertEqual(len(ExamAttempt.objects.get(id=attempt_id).drawn_question_ids), 3)
+
+        paper = self.client.get(f'/api/exams/attempts/{attempt_id}/paper/').json()
+        drawn = [question['id'] for question in paper['questions']]
+        self.assertEqual(len(drawn), 3)
+        self.assertEqual(self.client.get(f'/api/exams/attempts/{attempt_id}/paper/').json(), paper)
+
+        undrawn = next(question_id for question_id in self.correct if question_id not in drawn)
+        response = self.client.post('/api/exams/save-answers/', {
+            'attempt_id': attempt_id,
+            'answers': [{'question_id': undrawn, 'choice_id': self.correct[undrawn]}],
+        }, content_type='application/json')
+        self.assertEqual(response.json()['question_ids'], [undrawn])
+
+        response = self.client.post('/api/exams/save-answers/', {
+            'attempt_id': attempt_id,
+            'answers': [{'question_id': question_id, 'choice_id': self.correct[question_id]} for question_id in drawn],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        # A row for a question outside the draw, e.g. saved before the bank changed, does not count.
+        Answer.objects.create(attempt_id=attempt_id, question_id=undrawn, choice_id=self.correct[undrawn])
+
+        result = self.client.post(f'/api/exams/{self.exam.id}/submit/').json()
+        self.assertEqual((result['score'], result['total_questions']), (3, 3))
+
+    def test_bank_edits_leave_an_open_attempt_its_paper(self):
+        attempt_id = self.client.post(f'/api/exams/{self.exam.id}/start/').json()['attempt_id']
+        paper = self.client.get(f'/api/exams/attempts/{attempt_id}/paper/').json()
+        drawn = [question['id'] for question in paper['questions']]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.filter(exam=self.exam).exclude(id__in=drawn).first().delete()
+            self.create_exam(questions=5)[0].questions.update(exam=self.exam)
+        cache.clear()
+        self.assertEqual(self.client.get(f'/api/exams/attempts/{attempt_id}/paper/').json(), paper)
+
+        self.client.post('/api/exams/save-answers/', {
+            'attempt_id': attempt_id,
+            'answers': [{'question_id': question_id, 'choice_id': self.correct[question_id]} for question_id in drawn],
+        }, content_type='application/json')
+        result = self.client.post(f'/api/exams/{self.exam.id}/submit/').json()
+        self.assertEqual((result['score'], result['total_questions']), (3, 3))
+
+    def test_saves_check_the_draw_without_loading_the_pool(self):
+        attempt_id = self.client.post(f'/api/exams/{self.exam.id}/start/').json()['attempt_id']
+        question_id = self.client.get(f'/api/exams/attempts/{attempt_id}/paper/').json()['questions'][0]['id']
+
+        with mock.patch('exams.pools.get_question_pool', side_effect=AssertionError):
+            response = self.client.post('/api/exams/save-answer/', {
+                'attempt_id': attempt_id, 'question_id': question_id, 'choice_id': self.correct[question_id],
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_item_statistics_are_over_the_attempts_given_each_question(self):
+        for number in range(20):
+            seed, drawn = draw_questions(self.exam.id)
+            attempt = ExamAttempt.objects.create(
+                user=User.objects.create_user(f'candidate{number}'), exam=self.exam,
+                ends_at=timezone.now(), seed=seed, drawn_questions=drawn
+            )
+            for question_id in attempt.drawn_question_ids:
+                Answer.objects.create(attempt=attempt, question_id=question_id, choice_id=self.correct[question_id])
+            finalize_attempt(attempt)
+
+        questions = get_item_statistics(self.exam.id).report()['questions']
+        self.assertEqual(sum(question['exposed'] for question in questions), 20 * 3)
+        for question in questions:
+            if question['exposed']:
+                self.assertEqual(question['difficulty'], 1.0)
+                self.assertEqual([choice['share'] for choice in question['choices']], [1.0, 0.0])
+            else:
+                self.assertIsNone(question['difficulty'])
+
+
+class InstrumentationTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+        self.addCleanup(registry.clear)
+        self.exam, _ = self.create_exam()
+        self.client.force_login(User.objects.create_user('candidate'))
+
+    @override_settings(PERF_INSTRUMENTATION=True)
+    def test_server_timing_reports_each_phase(self):
+        paper = self.client.get(f'/api/exams/{self.exam.id}/')['Server-Timing']
+        for phase in ['session', 'auth', 'serialize', 'total']:
+            self.assertIn(f'{phase};dur=', paper)
+        self.assertRegex(paper, r'db;dur=[\d.]+;desc="\d+ queries"')
+        # Plain DRF responses are timed by the renderer, not only the cached byte responses.
+        self.assertIn('serialize;dur=', self.client.get('/api/auth/me/')['Server-Timing'])
+
+    def test_disabled_middleware_adds_nothing(self):
+        response = self.client.get('/api/auth/me/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(registry.snapshot(), [])
+
+    @override_settings(PERF_INSTRUMENTATION=True)
+    def test_metrics_render_as_prometheus_histograms(self):
+        self.client.get('/api/auth/me/')
+        self.client.force_login(User.objects.create_superuser('admin'))
+
+        response = self.client.get('/api/metrics/?format=prometheus')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        lines = response.content.decode().splitlines()
+        self.assertIn('# TYPE exam_request_timing histogram', lines)
+        self.assertIn('exam_request_timing_bucket{endpoint="me",metric="serialize",le="+Inf"} 1', lines)
+        self.assertIn('exam_request_timing_count{endpoint="me",metric="total"} 1', lines)
+        self.assertIn('exam_request_timing_bucket{endpoint="me",metric="queries",le="1"} 0', lines)
+
+
+class RendererTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exam, _ = self.create_exam(questions=20)
+        self.client.force_login(User.objects.create_user('candidate'))
+
+    def test_fast_renderer_matches_drf_output(self):
+        data = {
+            'ends_at': timezone.now(), 'marks': Decimal('1.50'), 'answers': {3: 7},
+            'text': 'line\u2028separator \u00e9',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_paper_is_negotiated_and_compressed(self):
+        url = f'/api/exams/{self.exam.id}/'
+        as_json = self.client.get(url)
+        as_msgpack = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(as_msgpack['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(as_msgpack.content, strict_map_key=False), as_json.json())
+        self.assertNotEqual(as_msgpack['ETag'], as_json['ETag'])
+        self.assertIn('Accept', as_json['Vary'])
+
+        compressed = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(compressed.content)), as_json.json())
+        revalidated = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+
+class WarmUpTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exams = seed_catalog(exams=2, questions=3, choices=2)
+
+    def test_warmed_exams_are_served_without_queries(self):
+        self.assertEqual(warm_caches(), [exam.id for exam in self.exams])
+        with self.assertNumQueries(0):
+            first_requests([('exam_list', ()), ('exam_detail', (self.exams[0].id,))])
+
+    def test_schema_is_written_with_a_gzipped_copy(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'openapi.json'
+            write_schema(path)
+            schema = json.loads(path.read_bytes())
+            self.assertIn('/exams/attempts/{attempt_id}/paper/', schema['paths'])
+            self.assertEqual(gzip.decompress(path.with_name('openapi.json.gz').read_bytes()), path.read_bytes())
+
+
+class ReplicaRouterTests(ExamTestCase):
+    @classmethod
+    def setUpClass(cls):
+        # A second SQLite file that holds only a course the primary does not have. It is
+        # added here rather than declared, so the test runner does not try to create it.
+        cls.databases = {'default', REPLICA_DB_ALIAS}
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings[REPLICA_DB_ALIAS] = {
+            **connections.settings['default'], 'NAME': f'{cls.directory.name}/replica.sqlite3',
+        }
+        with connections[REPLICA_DB_ALIAS].schema_editor() as editor:
+            editor.create_model(Course)
+        Course.objects.using(REPLICA_DB_ALIAS).create(title='Replica only')
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_DB_ALIAS].close()
+        del connections[REPLICA_DB_ALIAS]
+        del connections.settings[REPLICA_DB_ALIAS]
+        cls.directory.cleanup()
+
+    def test_reads_use_replica_only_when_asked(self):
+        self.assertEqual(list(Course.objects.values_list('title', flat=True)), [])
+        with read_from_replica():
+            course = Course.objects.get()
+            self.assertEqual(course.title, 'Replica only')
+            self.assertEqual(router.db_for_write(Course, instance=course), 'default')
+
+    def test_exam_papers_are_rendered_from_the_primary(self):
+        # The replica has no exams table at all, so any read routed there would fail.
+        exam, _ = self.create_exam()
+        self.client.force_login(User.objects.create_user('candidate'))
+        self.assertEqual(self.client.get('/api/exams/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/exams/{exam.id}/').json()['title'], 'Exam')
@@ -1,8 +1,10 @@
 from django.urls import path
+from . import async_views
 from .views import (
     ExamListView, ExamDetailView,
-    StartExamView, SaveAnswerView,
-    SubmitExamView, ExamResultView
+    StartExamView, SaveAnswerView, SaveAnswersView,
+    SubmitExamView, ExamResultView, ExamAnalyticsView,
+    ImportQuestionsView, ExportAttemptsView, AttemptPaperView
 )
 
 urlpatterns = [
@@ -10,6 +12,15 @@ urlpatterns = [
     path('<int:exam_id>/', ExamDetailView.as_view(), name='exam_detail'),
     path('<int:exam_id>/start/', StartExamView.as_view(), name='start_exam'),
     path('<int:exam_id>/submit/', SubmitExamView.as_view(), name='submit_exam'),
+    path('<int:exam_id>/analytics/', ExamAnalyticsView.as_view(), name='exam_analytics'),
+    path('questions/import/', ImportQuestionsView.as_view(), name='import_questions'),
+    path('attempts/export/', ExportAttemptsView.as_view(), name='export_attempts'),
     path('save-answer/', SaveAnswerView.as_view(), name='save_answer'),
+    path('save-answers/', SaveAnswersView.as_view(), name='save_answers'),
+    path('attempts/<int:attempt_id>/paper/', AttemptPaperView.as_view(), name='attempt_paper'),
     path('result/<int:attempt_id>/', ExamResultView.as_view(), name='exam_result'),
+    path('async/<int:exam_id>/start/', async_views.start_exam, name='async_start_exam'),
+    path('async/<int:exam_id>/submit/', async_views.submit_exam, name='async_submit_exam'),
+    path('async/save-answer/', async_views.save_answer, name='async_save_answer'),
+    path('async/result/<int:attempt_id>/', async_views.exam_result, name='async_exam_result'),
 ]
@@ -1,53 +1,108 @@
+import codecs
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from django.db import IntegrityError, transaction
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from datetime import timedelta
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
-from .models import Exam, ExamAttempt, Question, Answer, Choice
+from config.routers import read_from_replica
+
+from .analytics import get_item_statistics
+from .attempt_state import build_attempt_state, get_attempt_state, load_saved_answers, save_answers
+from .caching import (
+    RESULT_TIMEOUT, bytes_response, cache_result, get_cached_result,
+    get_exam_list, get_exam_paper, get_renderer, make_etag, render
+)
+from .export import FORMATS as EXPORT_FORMATS, export_attempts, parse_bound
+from .grading import finalize_attempt, invalid_answers
+from .idempotency import IdempotentMixin
+from .leaderboard import get_ranking
+from .models import Exam, ExamAttempt
+from .pools import draw_questions, get_question_pool
+from .question_bank import FORMATS, guess_format, import_questions, read_rows
 from .serializers import (
     ExamSerializer, ExamDetailSerializer,
-    SaveAnswerSerializer, AttemptResultSerializer
+    SaveAnswerSerializer, SaveAnswersSerializer, AttemptResultSerializer
 )
 
 
 def auto_submit_if_expired(attempt):
     if not attempt.is_submitted and timezone.now() > attempt.ends_at:
-        score = sum(
-            1 for answer in attempt.answers.select_related('choice')
-            if answer.choice.is_correct
-        )
-        attempt.score = score
-        attempt.is_submitted = True
-        attempt.save()
+        finalize_attempt(attempt)
         return True
     return False
 
 
 def get_saved_answers(attempt):
     return {
-        str(answer.question_id): answer.choice_id
-        for answer in attempt.answers.all()
+        str(question_id): choice_id
+        for question_id, choice_id in load_saved_answers(attempt.id).items()
     }
 
 
+def get_live_attempt_state(request, attempt_id):
+    state = get_attempt_state(attempt_id)
+    if state is None or state['user_id'] != request.user.id or state['is_submitted']:
+        raise Http404
+    return state
+
+
+def open_attempt(user, exam):
+    seed, drawn = draw_questions(exam.id) if exam.questions_per_attempt else (None, None)
+    try:
+        with transaction.atomic():
+            attempts_done = ExamAttempt.objects.filter(user=user, exam=exam).count()
+            if exam.max_attempts > 0 and attempts_done >= exam.max_attempts:
+                return None, False
+
+            attempt = ExamAttempt.objects.create(
+                user=user,
+                exam=exam,
+                ends_at=timezone.now() + timedelta(minutes=exam.duration),
+                seed=seed,
+                drawn_questions=drawn,
+            )
+    except IntegrityError:
+        # A concurrent retry opened the attempt first.
+        return ExamAttempt.objects.filter(user=user, exam=exam, is_submitted=False).first(), False
+
+    build_attempt_state(attempt)
+    return attempt, True
+
+
+def expired_response(attempt_id):
+    auto_submit_if_expired(get_object_or_404(ExamAttempt, id=attempt_id))
+    return Response(
+        {'error': 'Time expired. Your exam has been auto-submitted.'},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
 class ExamListView(APIView):
+    @swagger_auto_schema(responses={200: ExamSerializer(many=True)})
     def get(self, request):
-        exams = Exam.objects.filter(is_active=True).select_related('course')
-        serializer = ExamSerializer(exams, many=True)
-        return Response(serializer.data)
+        renderer = get_renderer(request)
+        etag, content = get_exam_list(renderer)
+        return bytes_response(request, content, etag, renderer=renderer)
 
 
 class ExamDetailView(APIView):
+    @swagger_auto_schema(responses={200: ExamDetailSerializer})
     def get(self, request, exam_id):
-        exam = get_object_or_404(Exam, id=exam_id, is_active=True)
-        serializer = ExamDetailSerializer(exam)
-        return Response(serializer.data)
+        renderer = get_renderer(request)
+        etag, content = get_exam_paper(exam_id, renderer)
+        return bytes_response(request, content, etag, renderer=renderer)
 
 
-class StartExamView(APIView):
+class StartExamView(IdempotentMixin, APIView):
     @swagger_auto_schema(operation_description="Start an exam attempt. No request body needed.")
     def post(self, request, exam_id):
         exam = get_object_or_404(Exam, id=exam_id, is_active=True)
@@ -57,30 +112,16 @@ class StartExamView(APIView):
         ).first()
 
         if existing:
-            if auto_submit_if_expired(existing):
-                return Response(
-                    {'error': 'Your previous attempt expired and was auto-submitted.'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            return Response({
-                'attempt_id': existing.id,
-                'ends_at': existing.ends_at,
-                'saved_answers': get_saved_answers(existing),
-                'message': 'Resuming existing attempt.'
-            }, status=status.HTTP_200_OK)
-
-        attempts_done = ExamAttempt.objects.filter(user=request.user, exam=exam).count()
-        if exam.max_attempts > 0 and attempts_done >= exam.max_attempts:
+            return self.resume(existing)
+
+        attempt, created = open_attempt(request.user, exam)
+        if attempt is None:
             return Response(
                 {'error': 'Maximum attempts reached.'},
                 status=status.HTTP_403_FORBIDDEN
             )
-
-        attempt = ExamAttempt.objects.create(
-            user=request.user,
-            exam=exam,
-            ends_at=timezone.now() + timedelta(minutes=exam.duration)
-        )
+        if not created:
+            return self.resume(attempt)
 
         return Response({
             'attempt_id': attempt.id,
@@ -89,69 +130,214 @@ class StartExamView(APIView):
             'message': 'Exam started.'
         }, status=status.HTTP_201_CREATED)
 
+    def resume(self, attempt):
+        if auto_submit_if_expired(attempt):
+            return Response(
+                {'error': 'Your previous attempt expired and was auto-submitted.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response({
+            'attempt_id': attempt.id,
+            'ends_at': attempt.ends_at,
+            'saved_answers': get_saved_answers(attempt),
+            'message': 'Resuming existing attempt.'
+        }, status=status.HTTP_200_OK)
 
-class SaveAnswerView(APIView):
+
+class SaveAnswerView(IdempotentMixin, APIView):
     @swagger_auto_schema(request_body=SaveAnswerSerializer)
     def post(self, request):
         serializer = SaveAnswerSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        attempt = get_object_or_404(
-            ExamAttempt,
-            id=serializer.validated_data['attempt_id'],
-            user=request.user,
-            is_submitted=False
-        )
+        attempt_id = serializer.validated_data['attempt_id']
+        state = get_live_attempt_state(request, attempt_id)
+        if timezone.now() > state['ends_at']:
+            return expired_response(attempt_id)
+
+        question_id = serializer.validated_data['question_id']
+        choice_id = serializer.validated_data['choice_id']
+        if invalid_answers(state, {question_id: choice_id}):
+            raise Http404
+
+        if not save_answers(attempt_id, {question_id: choice_id}):
+            raise Http404
+
+        return Response({'status': 'ok'})
+
 
-        if timezone.now() > attempt.ends_at:
-            auto_submit_if_expired(attempt)
+class SaveAnswersView(IdempotentMixin, APIView):
+    @swagger_auto_schema(request_body=SaveAnswersSerializer)
+    def post(self, request):
+        serializer = SaveAnswersSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        attempt_id = serializer.validated_data['attempt_id']
+        state = get_live_attempt_state(request, attempt_id)
+        if timezone.now() > state['ends_at']:
+            return expired_response(attempt_id)
+
+        answers = {
+            item['question_id']: item['choice_id']
+            for item in serializer.validated_data['answers']
+        }
+        invalid = invalid_answers(state, answers)
+        if invalid:
             return Response(
-                {'error': 'Time expired. Your exam has been auto-submitted.'},
+                {'error': 'Invalid question or choice.', 'question_ids': invalid},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        question = get_object_or_404(Question, id=serializer.validated_data['question_id'])
-        choice = get_object_or_404(Choice, id=serializer.validated_data['choice_id'])
+        if not save_answers(attempt_id, answers):
+            raise Http404
 
-        Answer.objects.update_or_create(
-            attempt=attempt,
-            question=question,
-            defaults={'choice': choice}
-        )
+        return Response({'status': 'ok', 'saved': len(answers)})
 
-        return Response({'status': 'ok'})
+
+class AttemptPaperView(APIView):
+    @swagger_auto_schema(
+        operation_description="The questions drawn for this attempt, in the order it was dealt them.",
+        responses={200: ExamDetailSerializer}
+    )
+    def get(self, request, attempt_id):
+        state = get_attempt_state(attempt_id)
+        if state is None or state['user_id'] != request.user.id:
+            raise Http404
+        renderer = get_renderer(request)
+        if state.get('drawn') is None:
+            etag, content = get_exam_paper(state['exam_id'], renderer)
+        else:
+            paper = get_question_pool(state['exam_id']).paper(state['seed'], state['drawn'])
+            content = render(paper, renderer)
+            etag = make_etag(content)
+        return bytes_response(request, content, etag, renderer=renderer)
 
 
-class SubmitExamView(APIView):
-    @swagger_auto_schema(operation_description="Submit the exam. No request body needed.")
+class SubmitExamView(IdempotentMixin, APIView):
+    @swagger_auto_schema(
+        operation_description="Submit the exam. No request body needed.",
+        responses={200: AttemptResultSerializer}
+    )
     def post(self, request, exam_id):
         exam = get_object_or_404(Exam, id=exam_id)
         attempt = get_object_or_404(
-            ExamAttempt,
+            ExamAttempt.objects.select_related('exam'),
             user=request.user,
             exam=exam,
             is_submitted=False
         )
 
-        auto_submit_if_expired(attempt)
-        attempt.refresh_from_db()
+        finalize_attempt(attempt)
 
-        if not attempt.is_submitted:
-            score = sum(
-                1 for answer in attempt.answers.select_related('choice')
-                if answer.choice.is_correct
-            )
-            attempt.score = score
-            attempt.is_submitted = True
-            attempt.save()
-
-        serializer = AttemptResultSerializer(attempt)
-        return Response(serializer.data)
+        renderer = get_renderer(request)
+        _, content = cache_result(attempt, renderer)
+        return bytes_response(request, content, renderer=renderer)
 
 
 class ExamResultView(APIView):
+    @swagger_auto_schema(
+        manual_parameters=[openapi.Parameter(
+            'ranking', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+            description='Include rank, percentile and the top of the leaderboard.'
+        )],
+        responses={200: AttemptResultSerializer}
+    )
     def get(self, request, attempt_id):
-        attempt = get_object_or_404(ExamAttempt, id=attempt_id, user=request.user)
-        serializer = AttemptResultSerializer(attempt)
-        return Response(serializer.data)
+        if request.query_params.get('ranking') in ('1', 'true'):
+            return self.get_with_ranking(request, attempt_id)
+
+        renderer = get_renderer(request)
+        result = get_cached_result(request.user.id, attempt_id, renderer)
+        if result is None:
+            attempts = ExamAttempt.objects.select_related('exam')
+            with read_from_replica():
+                attempt = attempts.filter(id=attempt_id, user=request.user, is_submitted=True).first()
+            if attempt is None:
+                # Live attempts, and results the replica has not caught up with yet.
+                attempt = get_object_or_404(attempts, id=attempt_id, user=request.user)
+            if not attempt.is_submitted:
+                serializer = AttemptResultSerializer(attempt)
+                return Response(serializer.data)
+            result = cache_result(attempt, renderer)
+
+        etag, content = result
+        return bytes_response(request, content, etag, max_age=RESULT_TIMEOUT, renderer=renderer)
+
+    def get_with_ranking(self, request, attempt_id):
+        attempt = get_object_or_404(
+            ExamAttempt.objects.select_related('exam'), id=attempt_id, user=request.user
+        )
+        data = AttemptResultSerializer(attempt).data
+        if attempt.is_submitted:
+            data['ranking'] = get_ranking(attempt)
+        return Response(data)
+
+
+class ExamAnalyticsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, exam_id):
+        get_object_or_404(Exam, id=exam_id)
+        return Response(get_item_statistics(exam_id).report())
+
+
+class ImportQuestionsView(APIView):
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('file', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True),
+        openapi.Parameter('exam_id', openapi.IN_FORM, type=openapi.TYPE_INTEGER),
+        openapi.Parameter('file_format', openapi.IN_FORM, type=openapi.TYPE_STRING, enum=list(FORMATS)),
+    ])
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload a question bank as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or guess_format(upload.name)
+        if file_format not in FORMATS:
+            return Response({'error': 'Unsupported file_format.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = codecs.iterdecode(upload, 'utf-8-sig')
+        report = import_questions(read_rows(lines, file_format, request.data.get('exam_id')))
+        created = report['imported'] and not report['error']
+        return Response(report, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+
+class ExportAttemptsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('exam_id', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        openapi.Parameter('since', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+        openapi.Parameter('until', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+        openapi.Parameter('file_format', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(EXPORT_FORMATS)),
+        openapi.Parameter('gzip', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+    ])
+    def get(self, request):
+        params = request.query_params
+        file_format = params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({'error': 'Unsupported file_format.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            exam_id = int(params['exam_id']) if params.get('exam_id') else None
+            since = parse_bound(params.get('since'))
+            until = parse_bound(params.get('until'))
+        except ValueError:
+            return Response(
+                {'error': 'exam_id must be an integer and since/until ISO dates.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        compress = params.get('gzip') in ('1', 'true')
+
+        filename = f'attempts.{file_format}' + ('.gz' if compress else '')
+        response = StreamingHttpResponse(
+            export_attempts(file_format, compress, exam_id=exam_id, since=since, until=until),
+            content_type='application/gzip' if compress else (
+                'text/csv' if file_format == 'csv' else 'application/jsonl'
+            ),
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,98 @@
+import gzip
+import pkgutil
+import time
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.urls import get_resolver, resolve, reverse
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.generators import OpenAPISchemaGenerator
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .caching import RENDERERS, get_exam_list, get_exam_paper
+from .grading import get_answer_key
+from .models import Exam
+from .pools import get_question_pool
+
+# Loaded on demand by manage.py or only ever by the test runner.
+SKIPPED_MODULES = {'management', 'migrations', 'tests', 'benchmark'}
+
+
+def preload_modules():
+    """Import our apps' modules and the URLconf, which Django otherwise imports on the first request."""
+    packages = [
+        app_config.module for app_config in apps.get_app_configs()
+        if app_config.path.startswith(str(settings.BASE_DIR))
+    ]
+    modules = 0
+    for package in packages:
+        for module in pkgutil.iter_modules(package.__path__):
+            if module.name not in SKIPPED_MODULES:
+                import_module(f'{package.__name__}.{module.name}')
+                modules += 1
+    # Pulls in the admin, drf-yasg and the rest of what the URLconf references.
+    get_resolver().url_patterns
+    return modules
+
+
+def write_schema(path):
+    """Write the OpenAPI schema, and a gzipped copy for WhiteNoise to serve, to ``path``."""
+    from config.urls import api_info
+
+    schema = OpenAPISchemaGenerator(info=api_info).get_schema(request=None, public=True)
+    content = OpenAPICodecJson(validators=[]).encode(schema)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    path.with_name(path.name + '.gz').write_bytes(gzip.compress(content, mtime=0))
+    return len(content)
+
+
+def warm_caches(exam_ids=None):
+    """Fill the exam list, paper, answer key and question pool caches; return the exams warmed."""
+    exams = Exam.objects.filter(is_active=True)
+    if exam_ids:
+        exams = exams.filter(id__in=exam_ids)
+    exams = list(exams.values_list('id', 'questions_per_attempt'))
+    for renderer in RENDERERS.values():
+        get_exam_list(renderer)
+    for exam_id, questions_per_attempt in exams:
+        for renderer in RENDERERS.values():
+            get_exam_paper(exam_id, renderer)
+        get_answer_key(exam_id)
+        if questions_per_attempt:
+            get_question_pool(exam_id)
+    return [exam_id for exam_id, _ in exams]
+
+
+def warm_worker():
+    """Warm a process that is about to fork its workers; they inherit the imports and a local cache."""
+    preload_modules()
+    warm_caches()
+    # Forked workers must not share the parent's database connections.
+    connections.close_all()
+
+
+def first_requests(routes):
+    """Time one GET per ``(url_name, args)`` in ms, as the first candidate on this process sees it.
+
+    The URLconf is imported inside the timing, as it would be on a cold worker.
+    """
+    factory = APIRequestFactory()
+    user = User(id=0, username='warm-up')
+    timings = {}
+    for name, args in routes:
+        started = time.perf_counter()
+        path = reverse(name, args=args)
+        request = factory.get(path)
+        force_authenticate(request, user)
+        match = resolve(path)
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        timings[path] = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} returned {response.status_code}')
+    return timings